@@ -0,0 +1,208 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+
+from crossword import Crossword
+from generate import CrosswordCreator
+import vocabulary
+
+# Grids the benchmarks are run on
+STRUCTURES = ["data/structure1.txt", "data/structure2.txt"]
+
+# Sizes, in words, of the synthetic vocabularies used by default
+SIZES = [3000, 30000, 300000]
+
+# Largest vocabulary the original set-based algorithms are run on
+LEGACY_WORDS = 30000
+
+# Patterns matched against each vocabulary
+PATTERNS = ["C_T__", "_A_E", "S____E__", "__T"]
+
+# Letters of synthetic words, weighted by how common they are in English
+LETTERS = "ETAOINSHRDLCUMWFGYPBVKJXQZ"
+WEIGHTS = [
+    12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8,
+    2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.2, 0.2, 0.1, 0.1,
+]
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [words,...]")
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) == 2 else SIZES
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("Indexing synthetic vocabularies")
+        for size in sizes:
+            words = os.path.join(directory, f"words{size}.txt")
+            with open(words, "w") as f:
+                f.write("\n".join(synthetic_words(size)))
+            benchmark_vocabulary(words, size)
+
+        print("Node and arc consistency over synthetic vocabularies")
+        for size in sizes:
+            words = os.path.join(directory, f"words{size}.txt")
+            for structure in STRUCTURES:
+                benchmark_consistency(structure, words, size)
+
+        print("Backtracking search, maintaining arc consistency or only checking assignments")
+        for size in sizes:
+            words = os.path.join(directory, f"words{size}.txt")
+            for structure in STRUCTURES:
+                benchmark_search(structure, words, size)
+
+
+def synthetic_words(count, seed=0):
+    """
+    Return `count` distinct random words of 3 to 12 letters, with letters
+    drawn as often as they are used in English.
+    """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        length = rng.randint(3, 12)
+        words.add("".join(rng.choices(LETTERS, WEIGHTS, k=length)))
+    return sorted(words)
+
+
+def benchmark_vocabulary(words, size):
+    """
+    Time indexing the vocabulary in the file `words` from scratch, loading
+    the index from its cache, and matching PATTERNS against it.
+    """
+    try:
+        os.remove(vocabulary.cache_path(words))
+    except OSError:
+        pass
+    start = time.perf_counter()
+    vocabulary.load(words)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = vocabulary.load(words)
+    cached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = sum(len(index.match(pattern)) for pattern in PATTERNS)
+    matched = (time.perf_counter() - start) / len(PATTERNS)
+    print(f"  {size:,} words: built {built:.3f}s, loaded from cache {cached:.3f}s, "
+          f"{matched * 1e6:.0f}us per pattern ({matches:,} matches)")
+
+
+class LegacyCreator(CrosswordCreator):
+    """
+    CrosswordCreator with its original domains, sets of words, and its
+    original node and arc consistency, which compare words letter by
+    letter and revise every arc again whenever a domain shrinks.
+    """
+
+    def __init__(self, crossword):
+        self.crossword = crossword
+        self.domains = {
+            var: self.crossword.words.copy()
+            for var in self.crossword.variables
+        }
+
+    def enforce_node_consistency(self):
+        for var in self.domains:
+            for word in self.domains[var].copy():
+                if var.length != len(word):
+                    self.domains[var].remove(word)
+
+    def revise(self, x, y):
+        revised = False
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is not None:
+            x_o, y_o = overlap
+            for X in self.domains[x].copy():
+                if not any(X[x_o] == Y[y_o] for Y in self.domains[y]):
+                    self.domains[x].remove(X)
+                    revised = True
+        return revised
+
+    def ac3(self, arcs=None):
+        queue = deque(arcs) if arcs is not None else deque(
+            (var, neighbor)
+            for var in self.domains
+            for neighbor in self.crossword.neighbors(var)
+        )
+        while queue:
+            x, y = queue.popleft()
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    return False
+                for z in self.crossword.neighbors(x) - {y}:
+                    queue.append((z, x))
+        return True
+
+
+def benchmark_consistency(structure, words, size):
+    """
+    Time node consistency followed by AC-3 on the grid `structure` with
+    the vocabulary in the file `words`, and the original algorithms too
+    when the vocabulary is small enough.
+    """
+    crossword = Crossword(structure, words)
+
+    start = time.perf_counter()
+    creator = CrosswordCreator(crossword)
+    creator.enforce_node_consistency()
+    creator.ac3()
+    elapsed = time.perf_counter() - start
+    line = f"  {os.path.basename(structure)}, {size:,} words: {elapsed:.3f}s"
+
+    if size <= LEGACY_WORDS:
+        start = time.perf_counter()
+        legacy = LegacyCreator(crossword)
+        legacy.enforce_node_consistency()
+        legacy.ac3()
+        line += f", original {time.perf_counter() - start:.3f}s"
+        if any(set(creator.domains[var]) != legacy.domains[var] for var in crossword.variables):
+            line += " (domains differ!)"
+    print(line)
+
+
+def benchmark_search(structure, words, size):
+    """
+    Time solving the grid `structure` with the vocabulary in the file
+    `words`, and count the nodes of the search tree, with search
+    maintaining arc consistency and, when the vocabulary is small enough,
+    with search only checking each assignment for consistency.
+    """
+    crossword = Crossword(structure, words)
+    line = f"  {os.path.basename(structure)}, {size:,} words:"
+    for maintain_consistency in [True, False]:
+        if not maintain_consistency and size > LEGACY_WORDS:
+            break
+        creator = CrosswordCreator(crossword, maintain_consistency)
+        nodes = count_nodes(creator)
+        start = time.perf_counter()
+        assignment = creator.solve()
+        elapsed = time.perf_counter() - start
+        label = "maintaining" if maintain_consistency else "checking"
+        line += f" {label} {elapsed:.3f}s ({nodes[0]:,} nodes"
+        line += ")," if assignment is not None else ", no solution),"
+    print(line.rstrip(","))
+
+
+def count_nodes(creator):
+    """
+    Count the calls to `creator.backtrack` in the list it returns, whose
+    only item is the count so far.
+    """
+    nodes = [0]
+    backtrack = creator.backtrack
+
+    def counted(assignment):
+        nodes[0] += 1
+        return backtrack(assignment)
+
+    creator.backtrack = counted
+    return nodes
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+from array import array
+from functools import cached_property
+
+import vocabulary
+
+
 class Variable():
 
     ACROSS = "across"
@@ -16,8 +22,12 @@ class Variable():
                  self.j + (k if self.direction == Variable.ACROSS else 0))
             )
 
+        # Variables are dictionary keys throughout the solver, so their
+        # hash is computed once
+        self._hash = hash((self.i, self.j, self.direction, self.length))
+
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self._hash
 
     def __eq__(self, other):
         return (
@@ -57,9 +67,9 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, indexed by length and by letter at each
+        # position, from its cache if it has one
+        self.index = vocabulary.load(words_file)
 
         # Determine variable set
         self.variables = set()
@@ -104,30 +114,87 @@ class Crossword():
                             length=length
                         ))
 
+        # Number the variables densely, in order of their starting point
+        self.ordered = sorted(
+            self.variables,
+            key=lambda var: (var.i, var.j, var.direction)
+        )
+        self.number = {var: k for k, var in enumerate(self.ordered)}
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored; any other pair looks up as None
+        covering = dict()
+        for k, var in enumerate(self.ordered):
+            for position, cell in enumerate(var.cells):
+                covering.setdefault(cell, []).append((k, position))
+        self.overlaps = Overlaps()
+        adjacency = [[] for _ in self.ordered]
+        for cover in covering.values():
+            for x, i in cover:
+                for y, j in cover:
+                    if x != y:
+                        self.overlaps[self.ordered[x], self.ordered[y]] = (i, j)
+                        adjacency[x].append((y, i, j))
+
+        # For each variable, by number, a tuple of (y, i, j) for every
+        # variable y it overlaps, by number, where its ith character
+        # overlaps y's jth character, and the set of those neighbors
+        self.adjacency = [tuple(sorted(adjacent)) for adjacent in adjacency]
+        self.neighbor_sets = [
+            frozenset(self.ordered[y] for y, _, _ in adjacent)
+            for adjacent in self.adjacency
+        ]
+
+        # Arcs, numbered in order of the adjacency: the arcs from variable
+        # x are numbered arc_offsets[x] up to arc_offsets[x + 1], one to
+        # each neighbor in adjacency[x], and reverse_arcs holds the number
+        # of the arc the other way for each arc
+        self.arc_offsets = array("i", [0])
+        for adjacent in self.adjacency:
+            self.arc_offsets.append(self.arc_offsets[-1] + len(adjacent))
+        self.arc_sources = array("i", (
+            x for x, adjacent in enumerate(self.adjacency) for _ in adjacent
+        ))
+        self.reverse_arcs = array("i", (
+            self.arc(y, x) for x, adjacent in enumerate(self.adjacency) for y, _, _ in adjacent
+        ))
+
+        # Length of each variable, by number
+        self.lengths = [var.length for var in self.ordered]
+
+    @cached_property
+    def words(self):
+        """Set of the vocabulary's words, built the first time it is used."""
+        return set(self.index.words)
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.neighbor_sets[self.number[var]]
+
+    def arc(self, x, y):
+        """
+        Return the number of the arc from variable number `x` to variable
+        number `y`, or None if they do not overlap.
+        """
+        for arc, (neighbor, _, _) in enumerate(self.adjacency[x], self.arc_offsets[x]):
+            if neighbor == y:
+                return arc
+        return None
+
+    def overlap(self, arc):
+        """
+        Return (x, y, i, j) for the arc numbered `arc`, from variable
+        number x to y, where x's ith character overlaps y's jth character.
+        """
+        x = self.arc_sources[arc]
+        return (x, *self.adjacency[x][arc - self.arc_offsets[x]])
+
+
+class Overlaps(dict):
+    """Overlaps of pairs of variables, None for pairs not stored."""
+
+    def __missing__(self, key):
+        return None
@@ -0,0 +1,156 @@
+import re
+from bisect import bisect_left
+from collections.abc import MutableSet
+
+# Bytes of a bitset with any bit set
+NONZERO = re.compile(rb"[^\x00]")
+
+
+class WordIndex():
+    """
+    Numbers every word of a vocabulary so that sets of words can be held
+    as bitsets: bit k of an int is set if the set holds word k.
+
+    Words are numbered in order of (length, word), so the words of each
+    length are a contiguous run of bits, starting at `start(length)`.
+    """
+
+    def __init__(self, words, ranges=None, letters=None):
+        """
+        Index `words`. If `ranges` and `letters` are given, as saved from
+        another WordIndex, `words` must already be in index order and are
+        used as they are.
+        """
+
+        # Number the words, grouped by length
+        if ranges is None:
+            words = sorted(words, key=lambda word: (len(word), word))
+        self.words = words
+        if ranges is not None:
+            self.ranges = ranges
+            self.letters = letters
+            return
+
+        # First and last index of the words of each length
+        self.ranges = dict()
+        for k, word in enumerate(self.words):
+            first, _ = self.ranges.get(len(word), (k, k))
+            self.ranges[len(word)] = (first, k + 1)
+
+        # Bitset of the words of each length with each letter at each
+        # position, keyed on (length, position), then on the letter.
+        # These count from the first word of the length, so they are only
+        # as wide as the number of words of that length.
+        self.letters = dict()
+        for length, (first, last) in self.ranges.items():
+            size = (last - first + 7) // 8
+            bitmaps = [dict() for _ in range(length)]
+            for k in range(last - first):
+                byte, bit = k >> 3, 1 << (k & 7)
+                for position, letter in enumerate(self.words[first + k]):
+                    bitmap = bitmaps[position].get(letter)
+                    if bitmap is None:
+                        bitmap = bitmaps[position][letter] = bytearray(size)
+                    bitmap[byte] |= bit
+            for position in range(length):
+                self.letters[length, position] = {
+                    letter: int.from_bytes(bitmap, "little")
+                    for letter, bitmap in bitmaps[position].items()
+                }
+
+    def number(self, word):
+        """
+        Return the index of `word`, or None if it is not in the index.
+        Words of each length are sorted, so it is found by bisection.
+        """
+        first, last = self.ranges.get(len(word), (0, 0))
+        k = bisect_left(self.words, word, first, last)
+        return k if k < last and self.words[k] == word else None
+
+    def start(self, length):
+        """Return the index of the first word of `length` letters."""
+        return self.ranges.get(length, (0, 0))[0]
+
+    def of_length(self, length):
+        """Return the bitset of every word of `length` letters."""
+        first, last = self.ranges.get(length, (0, 0))
+        return ((1 << (last - first)) - 1) << first
+
+    def letters_at(self, length, position):
+        """
+        Return a dict mapping each letter found at `position` in words of
+        `length` letters to the bitset of those words, counting from
+        `start(length)`.
+        """
+        return self.letters.get((length, position), dict())
+
+    def matching(self, pattern, blank="_"):
+        """
+        Return the bitset of the words as long as `pattern` with the same
+        letter at each of its positions that is not `blank`, so "C_T__"
+        matches every five letter word with C first and T third.
+        """
+        length = len(pattern)
+        first, last = self.ranges.get(length, (0, 0))
+        bits = (1 << (last - first)) - 1
+        for position, letter in enumerate(pattern):
+            if letter != blank:
+                bits &= self.letters_at(length, position).get(letter, 0)
+                if not bits:
+                    break
+        return bits << first
+
+    def match(self, pattern, blank="_"):
+        """Return a list of the words matching `pattern`, as `matching` does."""
+        return list(self.decode(self.matching(pattern, blank)))
+
+    def decode(self, bits):
+        """Yield the words in the bitset `bits`, in index order."""
+        # Clearing bits one at a time copies the whole int each time, so
+        # scan its bytes instead, skipping runs of zero bytes
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        for match in NONZERO.finditer(data):
+            start = match.start() * 8
+            byte = data[match.start()]
+            while byte:
+                low = byte & -byte
+                yield self.words[start + low.bit_length() - 1]
+                byte ^= low
+
+
+class Domain(MutableSet):
+    """
+    Set of words stored as a bitset over a WordIndex. It behaves like the
+    set of words it holds, and its `bits` can be changed directly.
+    """
+
+    def __init__(self, index, bits=0):
+        self.index = index
+        self.bits = bits
+
+    def __contains__(self, word):
+        k = self.index.number(word)
+        return k is not None and bool(self.bits >> k & 1)
+
+    def __iter__(self):
+        return self.index.decode(self.bits)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __repr__(self):
+        return f"Domain({set(self)!r})"
+
+    def add(self, word):
+        k = self.index.number(word)
+        if k is None:
+            raise KeyError(word)
+        self.bits |= 1 << k
+
+    def discard(self, word):
+        k = self.index.number(word)
+        if k is not None:
+            self.bits &= ~(1 << k)
+
+    def copy(self):
+        return Domain(self.index, self.bits)
@@ -2,20 +2,53 @@ import sys
 from PIL import Image, ImageDraw, ImageFont
 from crossword import Variable, Crossword
 from collections import deque
+from domains import Domain
 
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, maintain_consistency=True):
         """
         Create new CSP crossword generate.
+
+        If `maintain_consistency` is True, backtracking search keeps every
+        domain arc consistent with the assignment as it goes, and undoes
+        its changes when it backtracks; otherwise it only checks each
+        assignment for consistency.
         """
         self.crossword = crossword
+        self.maintain_consistency = maintain_consistency
+
+        # Domains are bitsets over the vocabulary, numbered by its index
+        self.index = self.crossword.index
+        everything = (1 << len(self.index.words)) - 1
         self.domains = {
-            var: self.crossword.words.copy()
+            var: Domain(self.index, everything)
             for var in self.crossword.variables
         }
 
+        # The solver works on variables and arcs by number, as the
+        # crossword's adjacency does, so it keeps the same domains in a
+        # list too
+        self.numbered = [self.domains[var] for var in self.crossword.ordered]
+        arcs = len(self.crossword.arc_sources)
+
+        # Support counts of arcs, by number, kept by ac3 (see
+        # `supports_for`), and the arcs counted since they were cleared
+        self.supports = [None] * arcs
+        self.counted = []
+
+        # Whether each arc, by number, is waiting in ac3's queue
+        self.queued = bytearray(arcs)
+
+        # Domains as they were before each change made during search, as
+        # (variable number, bits) pairs, or None when not searching
+        self.trail = None
+
+        # Whether each variable, by number, is assigned, or None when not
+        # searching
+        self.assigned = None
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -99,19 +132,11 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        
-        # First we need to enforce the unary constraints
-        # We must go through every variable and remove the domain value that is not the length of the variable
 
-        # We iterate through each variable in the dict
+        # Words of each length are a bitset in the index, so keeping only
+        # the words of the right length is a single AND per variable
         for var in self.domains:
-            # We then go through each word in the key set
-            for word in self.domains[var].copy():
-                # If the length of the word does not match the length of the variable
-                if var.length != len(word):
-                    # We remove it
-                    self.domains[var].remove(word)
-
+            self.domains[var].bits &= self.index.of_length(var.length)
 
     def revise(self, x, y):
         """
@@ -122,40 +147,99 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
+        x = self.crossword.number[x]
+        arc = self.crossword.arc(x, self.crossword.number[y])
+        if arc is None:
+            return False
+
+        # Support counts are only kept up to date while ac3 runs, so these
+        # are counted afresh and dropped again
+        removed = self.unsupported(arc)
+        self.clear_supports()
+        if not removed:
+            return False
+        self.remove(x, removed)
+        return True
 
-        # We create a revised variable to know if we have revised it
-        revised = False
-        # Assign a variable to the overlap pair
-        overlap = self.crossword.overlaps[x, y]
-
-        # We check if x and y even overlap
-        if overlap is not None:
-            # Assign a variable each index of the overlap pair
-            x_o = overlap[0]
-            y_o = overlap[1]
-            # If they overlap iterate through x domain
-            for X in self.domains[x].copy():
-                # Create a found variable to indiciate if we found an arc between two vars
-                found = False
-                # Iterate through y domain to see if we can find a match
-                for Y in self.domains[y]:
-                    # If the letter at index x_o in word X matches the index y_o in word Y
-                    if X[x_o] == Y[y_o]:
-                        # Change found to true
-                        found = True
-                        break
-                
-                # If we never found an arc to another domain value
-                if found == False:
-                    # Remove domain value
-                    self.domains[x].remove(X)
-                    # Change revised to true to signify that we have changed X's domain
-                    revised = True
-
-
-        return revised
-
+    def supports_for(self, arc):
+        """
+        Return the support counts of the arc numbered `arc`, from x to y: a
+        dict mapping each letter to the number of words left in `y`'s
+        domain with that letter where `y` overlaps `x`. Counts are kept in
+        `self.supports` and counted from `y`'s domain the first time they
+        are needed.
+        """
+        counts = self.supports[arc]
+        if counts is None:
+            _, y, _, y_o = self.crossword.overlap(arc)
+            length = self.crossword.lengths[y]
+            y_bits = self.numbered[y].bits >> self.index.start(length)
+            counts = self.supports[arc] = {
+                letter: (y_words & y_bits).bit_count()
+                for letter, y_words in self.index.letters_at(length, y_o).items()
+            }
+            self.counted.append(arc)
+        return counts
+
+    def clear_supports(self):
+        """Drop the support counts counted since they were last dropped."""
+        for arc in self.counted:
+            self.supports[arc] = None
+        self.counted.clear()
+
+    def unsupported(self, arc):
+        """
+        Return the bitset of words in the domain of x, for the arc numbered
+        `arc` from x to y, with a letter where `x` overlaps `y` that no word
+        left in `y`'s domain has there.
+        """
+        x, _, x_o, _ = self.crossword.overlap(arc)
+        counts = self.supports_for(arc)
+
+        # Letter bitsets count from the first word of each length
+        length = self.crossword.lengths[x]
+        unsupported = 0
+        for letter, x_words in self.index.letters_at(length, x_o).items():
+            if not counts.get(letter):
+                unsupported |= x_words
+        return self.numbered[x].bits & unsupported << self.index.start(length)
+
+    def remove(self, x, removed):
+        """
+        Remove the words in the bitset `removed` from the domain of
+        variable number `x`, and take them off the support counts of every
+        arc into `x`.
 
+        Return the numbers of the arcs into `x` that need revising: those
+        where some letter has lost its last support, and those not counted
+        yet.
+        """
+        domain = self.numbered[x]
+        if self.trail is not None:
+            self.trail.append((x, domain.bits))
+        domain.bits &= ~removed
+        length = self.crossword.lengths[x]
+        removed >>= self.index.start(length)
+
+        supports = self.supports
+        reverse_arcs = self.crossword.reverse_arcs
+        weakened = []
+        adjacent = enumerate(self.crossword.adjacency[x], self.crossword.arc_offsets[x])
+        for arc, (_, x_o, _) in adjacent:
+            into = reverse_arcs[arc]
+            counts = supports[into]
+            if counts is None:
+                weakened.append(into)
+                continue
+            exhausted = False
+            for letter, words in self.index.letters_at(length, x_o).items():
+                lost = (words & removed).bit_count()
+                if lost:
+                    counts[letter] -= lost
+                    exhausted = exhausted or not counts[letter]
+            if exhausted:
+                weakened.append(into)
+        return weakened
 
     def ac3(self, arcs=None):
         """
@@ -167,39 +251,52 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
 
-        # Begin by creating a queue
-        queue = deque(arcs) if arcs is not None else deque()
-
-        # If arcs is none then we have to populate all the arcs
+        # If arcs is none then we have to populate all the arcs; pairs of
+        # variables that do not overlap have nothing to make consistent
         if arcs is None:
-            # Iterate through the variables in the domain
-            for var in self.domains:
-                # Generate said variables neighbors
-                n = self.crossword.neighbors(var)
-
-                # For the variables arc produced by the neighbors set, append the pair arc to the queue
-                for arc in n:
-                    # Append the (v1, v2) representing an arc between the two to the queue
-                    queue.append((var, arc))
-
-        # While the queue is full
-        while queue:
-            # Assign variables x and y to the first queue item
-            x, y = queue.popleft()
-            # If we can revise x and y
-            if self.revise(x, y):
+            arcs = list(range(len(self.crossword.arc_sources)))
+        else:
+            number = self.crossword.number
+            arcs = [self.crossword.arc(number[x], number[y]) for x, y in arcs]
+            arcs = [arc for arc in arcs if arc is not None]
+        return self.propagate(arcs)
+
+    def propagate(self, arcs):
+        """
+        Run ac3 from the list `arcs` of arcs, by number, as `ac3` does.
+        """
+        sources, reverse_arcs = self.crossword.arc_sources, self.crossword.reverse_arcs
+        queue = deque(arcs)
+        queued = self.queued
+        for arc in queue:
+            queued[arc] = 1
+
+        # Each arc keeps a count of the words supporting each letter, so a
+        # removal only subtracts from the counts of the arcs into the
+        # variable it was removed from, and only arcs where a letter lost
+        # its last support are revised again
+        try:
+            while queue:
+                arc = queue.popleft()
+                queued[arc] = 0
+                removed = self.unsupported(arc)
+                if not removed:
+                    continue
+                x, back = sources[arc], reverse_arcs[arc]
+                for weakened in self.remove(x, removed):
+                    if weakened != back and not queued[weakened]:
+                        queue.append(weakened)
+                        queued[weakened] = 1
                 # If our variable has no possible domain values
-                if not self.domains[x]:
+                if not self.numbered[x].bits:
                     return False
-                # Go through all of x's other neighbors besides y
-                for z in self.crossword.neighbors(x) - {y}:
-                    # Append their arc
-                    queue.append((z, x))
+        finally:
+            for arc in queue:
+                queued[arc] = 0
+            self.clear_supports()
 
         return True
 
-
-
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
@@ -234,11 +331,11 @@ class CrosswordCreator():
             if assignment[var] in seen:
                 return False
             
-            # Iterate through all the neighbors
-            for neighbor in self.crossword.neighbors(var):
+            # Iterate through all the neighbors, and the index of both var
+            # and neighbor that is shared
+            for k, x, y in self.crossword.adjacency[self.crossword.number[var]]:
+                neighbor = self.crossword.ordered[k]
                 if neighbor in assignment:
-                # Assign a variable to the index of both var and neighbor that is shared
-                    x, y = self.crossword.overlaps[var, neighbor]
                     if assignment[var][x] != assignment[neighbor][y]:
                         # If not met return false
                         return False
@@ -257,29 +354,40 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
+        return self.values_in_order(self.crossword.number[var], self.assigned_in(assignment))
+
+    def values_in_order(self, x, assigned):
+        """
+        Return the values in the domain of variable number `x`, ordered as
+        `order_domain_values` does, where `assigned` says whether each
+        variable, by number, is assigned.
+        """
 
         # Create a list to store pairs of (candidate_value, number_ruled_out)
         scored = []
 
-        # For each candidate word that `var` could take
-        for val in self.domains[var]:
+        # For every variable that overlaps with `x`, skipping neighbors
+        # that are already assigned (they don't have a domain to reduce),
+        # keep i, the overlap index in `x`'s word, the neighbor's words
+        # by letter at its overlap index, and its domain, shifted to count
+        # from the first word of its length, as the letter bitsets do
+        lengths = self.crossword.lengths
+        neighbors = [
+            (i, self.index.letters_at(lengths[y], j),
+             self.numbered[y].bits >> self.index.start(lengths[y]))
+            for y, i, j in self.crossword.adjacency[x]
+            if not assigned[y]
+        ]
+
+        # For each candidate word that `x` could take
+        for val in self.numbered[x]:
             # Start a counter for how many neighbor-domain values this `val` would eliminate
             ruled_out = 0
 
-            # Look at every variable that overlaps with `var`
-            for neighbor in self.crossword.neighbors(var):
-                # Skip neighbors that are already assigned (they don't have a domain to reduce)
-                if neighbor in assignment:
-                    continue
-
-                # Get the overlap indices: i for `var`'s word, j for `neighbor`'s word
-                i, j = self.crossword.overlaps[var, neighbor]
-
-                # For every candidate word of the neighbor
-                for nval in self.domains[neighbor]:
-                    # If the overlap letters don't match, that neighbor word would be ruled out
-                    if val[i] != nval[j]:
-                        ruled_out += 1
+            # Every neighbor word without the same letter would be ruled out
+            for i, letters, bits in neighbors:
+                kept = bits & letters.get(val[i], 0)
+                ruled_out += bits.bit_count() - kept.bit_count()
 
             # Record the candidate word and how constraining it is
             scored.append((val, ruled_out))
@@ -298,17 +406,34 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
+        x = self.unassigned_variable(self.assigned_in(assignment))
+        return self.crossword.ordered[x]
+
+    def unassigned_variable(self, assigned):
+        """
+        Return the number of the variable `select_unassigned_variable`
+        would choose, where `assigned` says whether each variable, by
+        number, is assigned.
+        """
 
         # Candidates = variables not yet assigned
-        unassigned = [v for v in self.crossword.variables if v not in assignment]
+        unassigned = [x for x in range(len(assigned)) if not assigned[x]]
 
         # MRV: fewest remaining values; tie-break: most (unassigned) neighbors
+        adjacency = self.crossword.adjacency
         return min(
             unassigned,
-            key=lambda v: (len(self.domains[v]),
-                        -len(self.crossword.neighbors(v) - set(assignment.keys())))
+            key=lambda x: (len(self.numbered[x]),
+                           -sum(not assigned[y] for y, _, _ in adjacency[x]))
         )
 
+    def assigned_in(self, assignment):
+        """
+        Return a bytearray saying whether each variable, by number, is
+        assigned in `assignment`.
+        """
+        return bytearray(var in assignment for var in self.crossword.ordered)
+
 
     def backtrack(self, assignment):
         """
@@ -319,27 +444,80 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
+        # Start tracking which variables are assigned, by number, and a
+        # trail of domain changes for the search to undo
+        if self.assigned is None:
+            self.assigned = self.assigned_in(assignment)
+            if self.maintain_consistency:
+                self.trail = []
+            try:
+                return self.backtrack(assignment)
+            finally:
+                self.assigned = None
+                self.trail = None
+
         # Success: every variable assigned
-        if self.assignment_complete(assignment):
+        if 0 not in self.assigned:
             return assignment
 
         # Choose a variable to assign next (MRV/degree)
-        var = self.select_unassigned_variable(assignment)
+        x = self.unassigned_variable(self.assigned)
+        var = self.crossword.ordered[x]
 
         # Try values in least-constraining order
-        for value in self.order_domain_values(var, assignment):
+        for value in self.values_in_order(x, self.assigned):
             assignment[var] = value
-            if self.consistent(assignment):
+            self.assigned[x] = 1
+            if self.maintain_consistency:
+                # Prune the other domains, and restore them if this fails
+                mark = len(self.trail)
+                if self.infer(x, value):
+                    result = self.backtrack(assignment)
+                    if result is not None:
+                        return result
+                self.undo(mark)
+            elif self.consistent(assignment):
                 # Recurse
                 result = self.backtrack(assignment)
                 if result is not None:
                     return result
             # Undo and try next value
             del assignment[var]
+            self.assigned[x] = 0
 
         # No value worked
         return None
 
+    def infer(self, x, value):
+        """
+        Maintain arc consistency after assigning `value` to variable number
+        `x`: shrink its domain to `value`, remove `value` from the domains
+        of the unassigned variables it could also fill, and run ac3 on the
+        arcs into every variable whose domain changed.
+
+        Return False if any domain ends up empty.
+        """
+        bit = 1 << self.index.number(value)
+        others = self.numbered[x].bits & ~bit
+        arcs = self.remove(x, others) if others else []
+
+        # Every word is used at most once
+        for other, domain in enumerate(self.numbered):
+            if not self.assigned[other] and domain.bits & bit:
+                arcs += self.remove(other, bit)
+                if not domain.bits:
+                    return False
+
+        return self.propagate(arcs)
+
+    def undo(self, mark):
+        """
+        Restore the domains changed since the trail was `mark` entries long.
+        """
+        while len(self.trail) > mark:
+            x, bits = self.trail.pop()
+            self.numbered[x].bits = bits
+
 
 def main():
 
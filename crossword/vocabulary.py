@@ -0,0 +1,146 @@
+import os
+import struct
+import sys
+
+from domains import WordIndex
+
+# Bump whenever the layout of the cache changes
+VERSION = 1
+
+MAGIC = b"CROSSVOC"
+
+# Magic, version, then the mtime and size of the word list the cache was
+# built from, the number of words, the size of the words in bytes, and
+# the number of word lengths and letter bitsets that follow them
+HEADER = struct.Struct("<8sI4xqqqqqq")
+
+# Length, first and last index of the words of one length
+RANGE = struct.Struct("<qqq")
+
+# Length, position, letter (as a code point) and size in bytes of one
+# letter bitset; the bitsets follow all of these, in the same order
+BITSET = struct.Struct("<qqIxxxxq")
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python vocabulary.py words pattern [pattern ...]")
+    index = load(sys.argv[1])
+    for pattern in sys.argv[2:]:
+        words = index.match(pattern.upper())
+        print(f"{pattern}: {len(words):,} words")
+        for word in words[:10]:
+            print(f"  {word}")
+
+
+def cache_path(words_file):
+    """Return the path of the cache of `words_file`, a hidden file beside it."""
+    directory, filename = os.path.split(words_file)
+    return os.path.join(directory, f".{filename}.vocab")
+
+
+def load(words_file):
+    """
+    Return a WordIndex of the words in `words_file`, one per line, in
+    upper case.
+
+    The index is read from the cache of `words_file` if the cache was
+    built from a file of the same mtime and size. Otherwise it is built
+    from the words, and the cache is written for next time.
+    """
+    stat = os.stat(words_file)
+    index = read(cache_path(words_file), stat)
+    if index is None:
+        with open(words_file) as f:
+            index = WordIndex(set(f.read().upper().splitlines()))
+        save(cache_path(words_file), stat, index)
+    return index
+
+
+def save(path, stat, index):
+    """
+    Write the WordIndex `index` to the cache `path`, keyed on `stat`, the
+    os.stat of the word list it was built from.
+
+    Returns False if the cache could not be written.
+    """
+    words = "\n".join(index.words).encode("utf-8")
+    bitsets = [
+        (length, position, letter, bits.to_bytes((bits.bit_length() + 7) // 8, "little"))
+        for (length, position), letters in index.letters.items()
+        for letter, bits in letters.items()
+    ]
+
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, stat.st_mtime_ns, stat.st_size,
+                len(index.words), len(words), len(index.ranges), len(bitsets)
+            ))
+            f.write(words)
+            for length, (first, last) in index.ranges.items():
+                f.write(RANGE.pack(length, first, last))
+            for length, position, letter, data in bitsets:
+                f.write(BITSET.pack(length, position, ord(letter), len(data)))
+            for _, _, _, data in bitsets:
+                f.write(data)
+        os.replace(partial, path)
+    except OSError:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def read(path, stat):
+    """
+    Return the WordIndex in the cache `path`, or None if there is no
+    cache, or if it was written by another version or built from a word
+    list other than one matching `stat`.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = f.read()
+    except OSError:
+        return None
+
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, mtime, size, count, words_size, ranges, bitsets = HEADER.unpack_from(buffer)
+    if (magic, version, mtime, size) != (MAGIC, VERSION, stat.st_mtime_ns, stat.st_size):
+        return None
+
+    # A truncated or otherwise damaged cache is rebuilt
+    try:
+        view = memoryview(buffer)
+        position = HEADER.size + words_size
+        words = str(view[HEADER.size:position], "utf-8").split("\n") if count else []
+
+        lengths = dict()
+        for _ in range(ranges):
+            length, first, last = RANGE.unpack_from(buffer, position)
+            lengths[length] = (first, last)
+            position += RANGE.size
+
+        entries = []
+        for _ in range(bitsets):
+            entries.append(BITSET.unpack_from(buffer, position))
+            position += BITSET.size
+        letters = dict()
+        for length, k, letter, data_size in entries:
+            bits = int.from_bytes(view[position:position + data_size], "little")
+            letters.setdefault((length, k), dict())[chr(letter)] = bits
+            position += data_size
+    except (struct.error, UnicodeDecodeError, ValueError):
+        return None
+
+    if len(words) != count or position != len(buffer):
+        return None
+    return WordIndex(words, lengths, letters)
+
+
+if __name__ == "__main__":
+    main()
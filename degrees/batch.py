@@ -0,0 +1,126 @@
+import csv
+import sys
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+import degrees
+
+
+def main():
+    if len(sys.argv) not in [3, 4]:
+        sys.exit("Usage: python batch.py directory queries.csv [processes]")
+    directory = sys.argv[1]
+    processes = int(sys.argv[3]) if len(sys.argv) == 4 else None
+
+    # Queries are (source, target) person_id pairs, one per row
+    with open(sys.argv[2], encoding="utf-8") as f:
+        queries = [(row[0], row[1]) for row in csv.reader(f) if row]
+
+    degrees.load_data(directory)
+    paths = shortest_paths(directory, queries, processes)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["source", "target", "degrees", "path"])
+    for (source, target), path in zip(queries, paths):
+        if path is None:
+            writer.writerow([source, target, "", ""])
+        else:
+            steps = " ".join(f"{movie_id}:{person_id}" for movie_id, person_id in path)
+            writer.writerow([source, target, len(path), steps])
+
+
+def shortest_paths(directory, queries, processes=None):
+    """
+    Answer every (source, target) pair of person_ids in `queries` with
+    the same path `degrees.shortest_path` would find, in query order.
+
+    Queries are grouped by source, and each source is searched once, with
+    its targets answered from the resulting search tree. Sources are
+    spread across `processes` worker processes, which each load the data
+    in `directory`; with `processes` of 1 everything runs in this process.
+    """
+    queries = list(queries)
+    targets = defaultdict(set)
+    for source, target in queries:
+        targets[source].add(target)
+
+    answers = {}
+    for source, paths in run(directory, paths_from, list(targets.items()), processes):
+        for target, path in paths.items():
+            answers[source, target] = path
+
+    return [answers[query] for query in queries]
+
+
+def paths_from(job):
+    """
+    Search outwards from a source person_id once, stopping when every
+    target person_id has been reached.
+
+    `job` is a (source, targets) pair. Returns (source, paths), where
+    paths maps each target to its path, or None if it is not connected.
+    """
+    source, targets = job
+    graph = degrees.graph
+    paths = dict.fromkeys(targets)
+
+    source_index = graph.person_index(source)
+    indices = {}
+    for target in targets:
+        index = graph.person_index(target)
+        if index is not None:
+            indices[target] = index
+    if source_index is None or not indices:
+        return source, paths
+
+    parents, via, _ = degrees.search_tree(source_index, set(indices.values()))
+    for target, index in indices.items():
+        if index != source_index and parents[index] != -1:
+            paths[target] = degrees.trace_path(parents, via, index)
+    return source, paths
+
+
+def distance_histograms(directory, person_ids, processes=None):
+    """
+    Returns a dictionary mapping each person_id in `person_ids` to its
+    distance histogram (see `distance_histogram`), computed across
+    `processes` worker processes that each load the data in `directory`.
+    """
+    return dict(run(directory, histogram_for, list(person_ids), processes))
+
+
+def histogram_for(person_id):
+    return person_id, distance_histogram(person_id)
+
+
+def distance_histogram(person_id):
+    """
+    Returns a dictionary mapping each degree of separation to the number
+    of people that far from `person_id`, counting the person themselves
+    at 0. People not connected to `person_id` are left out.
+    """
+    source = degrees.graph.person_index(person_id)
+    if source is None:
+        raise KeyError(person_id)
+    _, _, distances = degrees.search_tree(source)
+    histogram = Counter(distances)
+    del histogram[-1]
+    return dict(sorted(histogram.items()))
+
+
+def run(directory, function, jobs, processes):
+    """
+    Yield `function(job)` for every job in `jobs`, in any order, using a
+    pool of `processes` workers that each load the data in `directory`.
+    """
+    if processes == 1 or len(jobs) <= 1:
+        if degrees.graph is None:
+            degrees.load_data(directory)
+        yield from map(function, jobs)
+        return
+    with Pool(processes, initializer=degrees.load_data, initargs=(directory,)) as pool:
+        yield from pool.imap_unordered(function, jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import csv
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+import landmarks
+from graph import INT_TABLES, STRING_TABLES, build_graph
+from util import Node, QueueFrontier
+
+# Number of random (source, target) pairs searched per benchmark
+PAIRS = 20
+
+# Time per fuzzy name lookup the name index is meant to stay under
+FUZZY_TARGET = 0.001
+
+# Pieces of the names given to generated people
+FIRST_NAMES = [
+    "Ada", "Alan", "Anna", "Ben", "Carla", "Chris", "Dana", "David", "Elena",
+    "Emma", "Frank", "Grace", "Hugo", "Irene", "Jack", "Julia", "Kevin",
+    "Laura", "Leo", "Maria", "Mark", "Nina", "Omar", "Paul", "Rosa", "Sam",
+    "Sara", "Tom", "Vera", "Will",
+]
+SYLLABLES = [
+    "an", "ber", "cal", "der", "el", "fa", "gan", "hol", "in", "ja", "kin",
+    "lo", "man", "ner", "os", "par", "quin", "ro", "son", "ta", "ur", "vin",
+    "wel", "ya", "zo",
+]
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [directory | --synthetic=PEOPLE] [pairs]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    pairs = int(sys.argv[2]) if len(sys.argv) == 3 else PAIRS
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if directory.startswith("--synthetic="):
+            size = int(directory.split("=", 1)[1])
+            directory = scratch
+            print(f"Generating synthetic dataset with {size} people...")
+            generate(directory, size)
+
+        benchmark_loaders(directory)
+
+        print("Loading data...")
+        start = time.perf_counter()
+        degrees.load_data(directory)
+        print(f"Data loaded in {time.perf_counter() - start:.2f}s.")
+
+        if degrees.landmark_index is None:
+            start = time.perf_counter()
+            degrees.landmark_index = landmarks.build(degrees.graph)
+            print(f"Landmarks built in {time.perf_counter() - start:.2f}s.")
+
+        queries = sample_pairs(pairs)
+        benchmark_frontiers(queries)
+        benchmark_searches(queries)
+        benchmark_allocations(queries)
+        benchmark_names(queries)
+
+
+def generate(directory, people, movies=None, cast=8, seed=0):
+    """
+    Write an IMDB-shaped dataset of `people` people into `directory`.
+
+    Every movie gets `cast` stars, drawn with a bias towards a small
+    set of prolific actors so the graph has the same hub-heavy shape
+    as the real data.
+    """
+    rng = random.Random(seed)
+    movies = movies or max(1, people // 3)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people):
+            writer.writerow([i, random_name(rng), 1900 + rng.randrange(120)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies):
+            writer.writerow([i, f"Movie {i}", 1900 + rng.randrange(120)])
+
+    hubs = max(1, people // 100)
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in range(movies):
+            for _ in range(cast):
+                if rng.random() < 0.2:
+                    person_id = rng.randrange(hubs)
+                else:
+                    person_id = rng.randrange(people)
+                writer.writerow([person_id, movie_id])
+
+
+def random_name(rng):
+    """Returns a made-up "First Last" name built from common syllables."""
+    first = rng.choice(FIRST_NAMES)
+    last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    return f"{first} {last.capitalize()}"
+
+
+def dict_reader_graph(directory):
+    """
+    Parse the CSV files in `directory` into a Graph the original way,
+    with a csv.DictReader and a dictionary per row.
+    """
+    people = {}
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            people[row["id"]] = (row["name"], row["birth"])
+    movies = {}
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            movies[row["id"]] = (row["title"], row["year"])
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        return build_graph(
+            tuple(map(list, zip(*((k, *v) for k, v in people.items())))),
+            tuple(map(list, zip(*((k, *v) for k, v in movies.items())))),
+            ((row["person_id"], row["movie_id"]) for row in csv.DictReader(f))
+        )
+
+
+def benchmark_loaders(directory):
+    """
+    Compare the time and peak memory of parsing `directory` with the
+    original DictReader loader and with `degrees.read_csv`, and check
+    that both build identical graphs.
+    """
+    print("Loader comparison")
+    graphs = {}
+    for name, loader in [("DictReader", dict_reader_graph), ("read_csv", degrees.read_csv)]:
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        graphs[name] = loader(directory)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name}: {elapsed:.2f}s, peak {peak / 2 ** 20:,.1f} MiB")
+    for table in STRING_TABLES + INT_TABLES:
+        if list(getattr(graphs["DictReader"], table)) != list(getattr(graphs["read_csv"], table)):
+            sys.exit(f"Loaders disagree on {table}.")
+
+    stats = {}
+    degrees.read_csv(directory, stats)
+    print(f"  read_csv: {stats['rows'] / stats['seconds']:,.0f} rows/s without tracing")
+
+
+def sample_pairs(count, seed=0):
+    """
+    Return `count` random (source, target) person_id pairs from the
+    loaded data.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    return [
+        (rng.choice(person_ids), rng.choice(person_ids))
+        for _ in range(count)
+    ]
+
+
+class ListQueueFrontier(QueueFrontier):
+    """
+    The original list-backed frontier: every pop copies the list and
+    every membership check scans it.
+    """
+
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        node = self.frontier[0]
+        self.frontier = self.frontier[1:]
+        return node
+
+
+def frontier_search(frontier_class, source, target):
+    """
+    Breadth-first search from `source` to `target` using `frontier_class`,
+    returning the length of the path found or None.
+    """
+    frontier = frontier_class()
+    frontier.add(Node(source, None, None))
+    visited = set()
+    while not frontier.empty():
+        node = frontier.remove()
+        visited.add(node.state)
+        if node.state == target:
+            length = 0
+            while node.parent is not None:
+                length += 1
+                node = node.parent
+            return length
+        for movie_id, person_id in degrees.neighbors_for_person(node.state):
+            if person_id not in visited and not frontier.contains_state(person_id):
+                frontier.add(Node(person_id, node, movie_id))
+    return None
+
+
+def benchmark_frontiers(queries):
+    """
+    Time the list-backed and deque-backed queue frontiers on `queries`.
+    """
+    print(f"Frontier comparison over {len(queries)} searches")
+    results = {}
+    for frontier_class in [ListQueueFrontier, QueueFrontier]:
+        start = time.perf_counter()
+        results[frontier_class] = [
+            frontier_search(frontier_class, source, target)
+            for source, target in queries
+        ]
+        elapsed = time.perf_counter() - start
+        print(f"  {frontier_class.__name__}: {elapsed:.3f}s")
+    if results[ListQueueFrontier] != results[QueueFrontier]:
+        sys.exit("Frontiers disagree on path lengths.")
+
+
+def benchmark_searches(queries):
+    """
+    Compare every search strategy in `degrees.SEARCHES` on `queries`,
+    reporting people expanded and latency per query.
+    """
+    print(f"Search comparison over {len(queries)} searches")
+    lengths = {}
+    for name, search in degrees.SEARCHES.items():
+        expanded = 0
+        latencies = []
+        lengths[name] = []
+        for source, target in queries:
+            stats = {}
+            start = time.perf_counter()
+            path = search(source, target, stats=stats)
+            latencies.append(time.perf_counter() - start)
+            expanded += stats["expanded"]
+            lengths[name].append(None if path is None else len(path))
+        latencies.sort()
+        print(
+            f"  {name}: {expanded / len(queries):,.0f} expanded/query, "
+            f"mean {1000 * sum(latencies) / len(latencies):.2f}ms, "
+            f"median {1000 * latencies[len(latencies) // 2]:.2f}ms, "
+            f"max {1000 * latencies[-1]:.2f}ms"
+        )
+    if len(set(map(tuple, lengths.values()))) > 1:
+        sys.exit("Searches disagree on path lengths.")
+
+
+def benchmark_allocations(queries):
+    """
+    Compare the allocations of a search that expands people through
+    `degrees.neighbors_for_person` with the movie-hop search on `queries`.
+    """
+    print(f"Allocation comparison over {len(queries)} searches")
+
+    # Count the (movie_id, person_id) tuples neighbors_for_person builds
+    created = 0
+    neighbors_for_person = degrees.neighbors_for_person
+
+    def counting_neighbors(person_id):
+        nonlocal created
+        neighbors = neighbors_for_person(person_id)
+        created += len(neighbors)
+        return neighbors
+
+    degrees.neighbors_for_person = counting_neighbors
+    try:
+        peak = traced_peak(lambda: [
+            frontier_search(QueueFrontier, source, target)
+            for source, target in queries
+        ])
+    finally:
+        degrees.neighbors_for_person = neighbors_for_person
+    print(
+        f"  neighbors_for_person: {created / len(queries):,.0f} neighbor tuples/query, "
+        f"peak {peak / 2 ** 20:,.1f} MiB"
+    )
+
+    scanned = 0
+
+    def movie_hop():
+        nonlocal scanned
+        for source, target in queries:
+            stats = {}
+            degrees.movie_hop_shortest_path(source, target, stats=stats)
+            scanned += stats["scanned"]
+
+    peak = traced_peak(movie_hop)
+    print(
+        f"  movie-hop: 0 neighbor tuples/query, {scanned / len(queries):,.0f} "
+        f"cast entries scanned/query, peak {peak / 2 ** 20:,.1f} MiB"
+    )
+
+
+def benchmark_names(queries):
+    """
+    Time exact, prefix and fuzzy name lookups for the people in `queries`,
+    with one letter of each name changed for the fuzzy lookups.
+    """
+    print(f"Name lookup comparison over {len(queries)} names")
+    rng = random.Random(0)
+    graph = degrees.graph
+    names = [degrees.people[source]["name"] for source, _ in queries]
+    typos = []
+    for name in names:
+        i = rng.randrange(len(name))
+        typos.append(name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:])
+
+    lookups = [
+        ("exact", lambda name: graph.people_named(name.lower()), names),
+        ("prefix", lambda name: graph.names_with_prefix(name[:len(name) // 2].lower(), 10), names),
+        ("fuzzy", lambda name: graph.similar_names(name.lower(), 10), typos),
+    ]
+    for kind, lookup, inputs in lookups:
+        start = time.perf_counter()
+        results = [lookup(name) for name in inputs]
+        elapsed = time.perf_counter() - start
+        line = f"  {kind}: {1000 * elapsed / len(inputs):.3f}ms/lookup"
+        if kind == "fuzzy":
+            met = "met" if elapsed / len(inputs) < FUZZY_TARGET else "NOT met"
+            line += f" (target {1000 * FUZZY_TARGET:g}ms: {met})"
+        print(line)
+
+    found = sum(
+        name in degrees.suggest_names(typo)
+        for name, typo in zip(names, typos)
+    )
+    print(f"  suggestions included the intended name for {found} of {len(names)} typos")
+
+
+def traced_peak(function):
+    """Call `function` and return the peak memory it allocated, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
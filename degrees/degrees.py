@@ -1,7 +1,21 @@
 import csv
 import sys
+import time
+from array import array
+from collections import deque
 
-from util import Node, StackFrontier, QueueFrontier
+import landmarks
+import snapshot
+from graph import Movies, Names, People, build_graph
+
+# Compact integer-indexed graph holding all people, movies and stars
+graph = None
+
+# Optional precomputed landmark distances, built with landmarks.py
+landmark_index = None
+
+# Least trigram similarity for a name to be suggested in place of another
+SIMILARITY = 0.4
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -13,54 +27,116 @@ people = {}
 movies = {}
 
 
-def load_data(directory):
+def load_data(directory, stats=None):
     """
     Load data from CSV files into memory.
+
+    The data is kept in a compact `graph`; `names`, `people` and `movies`
+    are read-only views over it. The graph is saved as a snapshot next to
+    the CSV files, and later loads map that snapshot instead of parsing
+    the CSV files again, for as long as the files are unchanged. A landmark
+    index built for the same files is loaded into `landmark_index`.
+
+    If `stats` is a dict, the number of CSV rows parsed and the seconds
+    spent parsing them are stored under "rows" and "seconds".
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    global graph, landmark_index, names, people, movies
+
+    key = snapshot.source_key(directory)
+    graph = snapshot.load(directory, key)
+    if graph is None:
+        graph = read_csv(directory, stats)
+        snapshot.save(graph, directory, key)
+    elif stats is not None:
+        stats["rows"] = stats["seconds"] = 0
+    landmark_index = landmarks.load(directory, key)
+
+    names = Names(graph)
+    people = People(graph)
+    movies = Movies(graph)
+
+
+def read_csv(directory, stats=None):
+    """
+    Parse the CSV files in `directory` into a Graph, streaming each file
+    once and reading its columns by position.
 
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    If `stats` is a dict, the number of rows parsed and the seconds
+    spent parsing them are stored under "rows" and "seconds".
+    """
+    start = time.perf_counter()
+    person_table = read_columns(f"{directory}/people.csv", ["id", "name", "birth"])
+    movie_table = read_columns(f"{directory}/movies.csv", ["id", "title", "year"])
+    star_rows = [0]
+
+    def read_stars(f):
+        reader = csv.reader(f)
+        header = next(reader, [])
+        person_column = header.index("person_id")
+        movie_column = header.index("movie_id")
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+            if row:
+                star_rows[0] += 1
+                yield row[person_column], row[movie_column]
+
+    with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+        result = build_graph(person_table, movie_table, read_stars(f))
+
+    if stats is not None:
+        stats["rows"] = len(person_table[0]) + len(movie_table[0]) + star_rows[0]
+        stats["seconds"] = time.perf_counter() - start
+    return result
+
+
+def read_columns(path, columns):
+    """
+    Returns a tuple holding a list of values for each of the named
+    `columns` of the CSV file at `path`, in row order.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        table = tuple([] for _ in columns)
+        appends = list(zip([values.append for values in table], positions))
         for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+            if row:
+                for append, position in appends:
+                    append(row[position])
+    return table
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(
+        arg[2:].split("=", 1) for arg in sys.argv[1:]
+        if arg.startswith("--") and "=" in arg
+    )
+    search = options.get("search", "bfs")
+    if len(args) > 1 or search not in SEARCHES:
+        sys.exit(
+            "Usage: python degrees.py [directory] "
+            f"[--search={'|'.join(SEARCHES)}] [--serve=socket]"
+        )
+    directory = args[0] if args else "large"
+
+    # Answer queries from a long-lived server instead of interactively
+    if "serve" in options:
+        import server
+        server.serve(directory, options["serve"])
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    stats = {}
+    load_data(directory, stats)
+    if stats["rows"]:
+        rate = stats["rows"] / max(stats["seconds"], 1e-9)
+        print(f"Data loaded ({stats['rows']:,} rows at {rate:,.0f} rows/s).")
+    else:
+        print("Data loaded from snapshot.")
+    if search == "landmark" and landmark_index is None:
+        sys.exit(f"No landmark index; build one with: python landmarks.py {directory}")
     #print(names)
     #print()
     #print(people)
@@ -68,14 +144,16 @@ def main():
     #print(movies)
     #print()
 
-    source = person_id_for_name(input("Name: "))
+    name = input("Name: ")
+    source = person_id_for_name(name)
     if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+        sys.exit(not_found(name))
+    name = input("Name: ")
+    target = person_id_for_name(name)
     if target is None:
-        sys.exit("Person not found.")
+        sys.exit(not_found(name))
 
-    path = shortest_path(source, target)
+    path = SEARCHES[search](source, target)
 
     if path is None:
         print("Not connected.")
@@ -90,44 +168,293 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    If `stats` is a dict, the number of people expanded and cast entries
+    scanned are stored under "expanded" and "scanned".
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+
+    if source is None or target is None or source == target:
+        if stats is not None:
+            stats["expanded"] = stats["scanned"] = 0
+        return None
+
+    parents, via, _ = search_tree(source, {target}, stats)
+    if parents[target] == -1:
+        return None
+    return trace_path(parents, via, target)
+
+
+def search_tree(source, targets=None, stats=None):
     """
+    Breadth-first search outwards from the person with index `source`,
+    stopping once every index in `targets` has been reached, or once
+    everyone connected to `source` has been reached if `targets` is None.
+
+    Returns (parents, via, distances) arrays indexed by person: the person
+    and movie each person was reached through, and their degrees of
+    separation from `source`. All three are -1 for people not reached.
+
+    If `stats` is a dict, the number of people expanded and cast entries
+    scanned are stored under "expanded" and "scanned".
+    """
+    remaining = set(targets) - {source} if targets is not None else None
+    parents = array("i", [-1]) * len(graph.person_ids)
+    via = array("i", [-1]) * len(graph.person_ids)
+    distances = array("i", [-1]) * len(graph.person_ids)
+    parents[source] = source
+    distances[source] = 0
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+
+    expanded = scanned = 0
+    done = remaining is not None and not remaining
+    frontier = deque([source])
+    while frontier and not done:
+        person = frontier.popleft()
+        expanded += 1
+        distance = distances[person] + 1
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            start, end = movie_offsets[movie], movie_offsets[movie + 1]
+            scanned += end - start
+            for j in range(start, end):
+                neighbor = movie_stars[j]
+                if parents[neighbor] != -1:
+                    continue
+                parents[neighbor] = person
+                via[neighbor] = movie
+                distances[neighbor] = distance
+                frontier.append(neighbor)
+                if remaining is not None and neighbor in remaining:
+                    remaining.remove(neighbor)
+                    done = not remaining
+                    if done:
+                        break
+            if done:
+                break
+
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["scanned"] = scanned
+
+    return parents, via, distances
 
-    answer =[]
 
-    root = Node(source, parent=None, action=None)
+def movie_hop_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching the bipartite
+    graph person -> movie -> person so that each movie's cast is only
+    scanned the first time the movie is reached.
+
+    If no possible path, returns None. The path found is the same one
+    `shortest_path` finds.
 
-    frontier = QueueFrontier()
-    visited = set()
+    If `stats` is a dict, the number of people expanded and cast entries
+    scanned are stored under "expanded" and "scanned".
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    expanded = scanned = 0
+    answer = None
 
-    frontier.add(root)
+    if source is not None and target is not None and source != target:
+        # The movie each reached person was reached through, and the
+        # person each reached movie was reached from; -1 marks neither
+        person_via = array("i", [-1]) * len(graph.person_ids)
+        movie_via = array("i", [-1]) * len(graph.movie_ids)
+        person_via[source] = -2
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
 
-    while not frontier.empty():
-        node = frontier.remove()
-        visited.add(node.state)
+        frontier = deque([source])
+        while frontier and answer is None:
+            person = frontier.popleft()
+            expanded += 1
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                if movie_via[movie] != -1:
+                    continue
+                movie_via[movie] = person
+                start, end = movie_offsets[movie], movie_offsets[movie + 1]
+                scanned += end - start
+                for j in range(start, end):
+                    neighbor = movie_stars[j]
+                    if person_via[neighbor] != -1:
+                        continue
+                    person_via[neighbor] = movie
+                    if neighbor == target:
+                        answer = []
+                        break
+                    frontier.append(neighbor)
+                if answer is not None:
+                    break
 
-        if target == node.state:
-            while node.parent is not None:
-                answer.append((node.action, node.state))
-                node = node.parent
+        # Follow the parent pointers back from the target
+        if answer is not None:
+            person = target
+            while person != source:
+                movie = person_via[person]
+                answer.append((graph.movie_ids[movie], graph.person_ids[person]))
+                person = movie_via[movie]
             answer.reverse()
-            break
-
-        for movie_id, name_id in neighbors_for_person(node.state):
-            if name_id not in visited and not frontier.contains_state(name_id):
-                child = Node(name_id, node, movie_id)
-                frontier.add(child)
-    
-    if not answer:
+
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["scanned"] = scanned
+
+    return answer
+
+
+def trace_path(parents, via, person):
+    """
+    Follow `parents` and `via` back from `person` to the search's root,
+    returning the (movie_id, person_id) pairs from the root to `person`.
+    """
+    answer = []
+    while parents[person] != person:
+        answer.append((graph.movie_ids[via[person]], graph.person_ids[person]))
+        person = parents[person]
+    answer.reverse()
+    return answer
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards from
+    both people at once and stopping when the two searches meet.
+
+    If no possible path, returns None.
+
+    If `stats` is a dict, the number of people expanded is stored
+    under "expanded".
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+
+    # Maps each reached person to the (movie, person) step that leads
+    # back towards the side's starting person. Each side only reaches a
+    # small part of the graph, so dicts are cheaper than full arrays.
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    expanded = 0
+    meeting = None
+
+    if source is not None and target is not None and source != target:
+        # Always grow whichever side has the smaller frontier, one full
+        # layer at a time, so the first meeting is on a shortest path
+        while forward_layer and backward_layer and meeting is None:
+            if len(forward_layer) <= len(backward_layer):
+                expanded += len(forward_layer)
+                forward_layer, meeting = expand_layer(forward_layer, forward, backward)
+            else:
+                expanded += len(backward_layer)
+                backward_layer, meeting = expand_layer(backward_layer, backward, forward)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+
+    if meeting is None:
         return None
 
+    answer = []
+    person = meeting
+    while forward[person] is not None:
+        movie, previous = forward[person]
+        answer.append((graph.movie_ids[movie], graph.person_ids[person]))
+        person = previous
+    answer.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, person = backward[person]
+        answer.append((graph.movie_ids[movie], graph.person_ids[person]))
+
     return answer
 
+
+def expand_layer(layer, parents, others):
+    """
+    Expand every person in `layer`, recording newly reached people in
+    `parents`. Returns the next layer and the first newly reached person
+    already in `others`, or None if the searches have not met.
+    """
+    next_layer = []
+    for person in layer:
+        for movie in graph.movies_of(person):
+            for neighbor in graph.stars_of(movie):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                if neighbor in others:
+                    return next_layer, neighbor
+                next_layer.append(neighbor)
+    return next_layer, None
+
+
+def landmark_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using an A* search guided
+    by the landmark index.
+
+    If no possible path, returns None.
+
+    If `stats` is a dict, the number of people expanded is stored
+    under "expanded".
+    """
+    if landmark_index is None:
+        raise LookupError("no landmark index loaded")
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if source is None or target is None:
+        if stats is not None:
+            stats["expanded"] = 0
+        return None
+
+    path = landmarks.astar(graph, landmark_index, source, target, stats=stats)
+    if not path:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def within_degrees(source, target, n):
+    """
+    Returns True if the source and target are connected by a path of
+    at most `n` degrees of separation.
+
+    The landmark index answers most questions from its bounds alone, and
+    only undecided ones need a search.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if source is None or target is None:
+        return False
+    if source == target:
+        return True
+    if landmark_index is None:
+        parents, _, distances = search_tree(source, {target})
+        return parents[target] != -1 and distances[target] <= n
+
+    lower, upper = landmark_index.bounds(source, target)
+    if lower > n:
+        return False
+    if upper <= n:
+        return True
+    return landmarks.astar(graph, landmark_index, source, target, limit=n) is not None
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -154,18 +481,61 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def suggest_names(name, limit=5):
+    """
+    Returns up to `limit` names of people that `name` may have meant:
+    names it is a prefix of, then names with a trigram similarity of at
+    least SIMILARITY.
+    """
+    key = name.strip().lower()
+    if not key:
+        return []
+    positions = graph.names_with_prefix(key, limit)
+    if len(positions) < limit:
+        for position, similarity in graph.similar_names(key, limit):
+            if similarity >= SIMILARITY and position not in positions:
+                positions.append(position)
+    return [
+        graph.person_names[graph.name_people[position]]
+        for position in positions[:limit]
+    ]
+
+
+def not_found(name):
+    """
+    Returns the message shown when nobody is called `name`, listing
+    any similar names.
+    """
+    suggestions = suggest_names(name)
+    if not suggestions:
+        return "Person not found."
+    return f"Person not found. Did you mean: {', '.join(suggestions)}?"
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
+    person = graph.person_index(person_id)
+    if person is None:
+        raise KeyError(person_id)
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in graph.movies_of(person):
+        movie_id = graph.movie_ids[movie]
+        for star in graph.stars_of(movie):
+            neighbors.add((movie_id, graph.person_ids[star]))
     return neighbors
 
 
+# Search strategies selectable with --search
+SEARCHES = {
+    "bfs": shortest_path,
+    "bidirectional": bidirectional_shortest_path,
+    "landmark": landmark_shortest_path,
+    "movie-hop": movie_hop_shortest_path,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,389 @@
+import bisect
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+# Tables of strings that make up a Graph
+STRING_TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+    "name_keys", "trigram_keys",
+)
+
+# Tables of integers that make up a Graph
+INT_TABLES = (
+    "person_offsets", "person_movies",
+    "movie_offsets", "movie_stars",
+    "name_people", "trigram_offsets", "trigram_names",
+)
+
+# Most trigram postings counted when looking for similar names; the
+# rarest trigrams of the query are counted first
+TRIGRAM_BUDGET = 8000
+
+# Names seen in the rarest trigrams of a query after which commoner
+# trigrams only add to the counts of names already seen
+ADMITTED = 1000
+
+# Number of names with the most trigrams in common that are scored
+CANDIDATES = 50
+
+
+class Graph():
+    """
+    Actor/movie graph with people and movies interned to dense ints.
+
+    People and movies are numbered in sorted order of their IMDB ids, so
+    an id is found by bisecting `person_ids` or `movie_ids`. Adjacency is
+    stored in compressed sparse row form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the
+    stars of movie `m` are found the same way in `movie_stars`.
+
+    `name_keys` holds every person's lowercased name in sorted order, and
+    `name_people` the person each key belongs to. `trigram_keys` holds
+    every trigram of those names in sorted order, and the positions in
+    `name_keys` of the distinct names containing trigram `k` are
+    `trigram_names[trigram_offsets[k]:trigram_offsets[k + 1]]`.
+    """
+
+    def __init__(self, **tables):
+        for table in STRING_TABLES + INT_TABLES:
+            setattr(self, table, tables[table])
+        self.postings = None
+
+    def person_index(self, person_id):
+        """Returns the index of `person_id`, or None if it is unknown."""
+        return find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """Returns the index of `movie_id`, or None if it is unknown."""
+        return find(self.movie_ids, movie_id)
+
+    def movies_of(self, person):
+        """Returns the indices of the movies person `person` starred in."""
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """Returns the indices of the people who starred in movie `movie`."""
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def people_named(self, name):
+        """Returns the indices of the people whose lowercased name is `name`."""
+        start = bisect.bisect_left(self.name_keys, name)
+        end = bisect.bisect_right(self.name_keys, name, lo=start)
+        return [self.name_people[i] for i in range(start, end)]
+
+    def names_with_prefix(self, prefix, limit):
+        """
+        Returns the positions in `name_keys` of up to `limit` distinct
+        names starting with `prefix`, in alphabetical order.
+        """
+        keys = self.name_keys
+        position = bisect.bisect_left(keys, prefix)
+        matches = []
+        previous = None
+        while position < len(keys) and len(matches) < limit:
+            key = keys[position]
+            if not key.startswith(prefix):
+                break
+            if key != previous:
+                matches.append(position)
+                previous = key
+            position += 1
+        return matches
+
+    def similar_names(self, name, limit):
+        """
+        Returns (position, similarity) pairs for up to `limit` distinct
+        names in `name_keys` most similar to `name`, most similar first.
+
+        Similarity is the Dice coefficient of the two names' trigrams.
+        Candidates are the CANDIDATES names sharing the most of the
+        query's trigrams, counted rarest trigram first, counting at most
+        TRIGRAM_BUDGET postings. Only names containing the rarest
+        trigrams are candidates: once ADMITTED names have been seen, the
+        commoner trigrams only add to the counts of names already seen.
+        """
+        query = trigrams(name)
+        postings_of = self.trigram_postings()
+        postings = sorted(
+            (postings_of[trigram] for trigram in query if trigram in postings_of),
+            key=lambda posting: posting[1] - posting[0]
+        )
+
+        hits = Counter()
+        counted = 0
+        for start, end in postings:
+            if counted and counted + end - start > TRIGRAM_BUDGET:
+                break
+            names = self.trigram_names[start:end]
+            hits.update(names if len(hits) < ADMITTED else hits.keys() & names)
+            counted += end - start
+
+        scored = []
+        for position, _ in hits.most_common(CANDIDATES):
+            key = self.name_keys[position]
+            other = trigrams(key)
+            similarity = 2 * len(query & other) / (len(query) + len(other))
+            scored.append((-similarity, key, position))
+        scored.sort()
+        return [(position, -similarity) for similarity, _, position in scored[:limit]]
+
+    def trigram_postings(self):
+        """
+        Returns a dict from each trigram to the (start, end) of the names
+        containing it in `trigram_names`, built the first time it is used.
+        """
+        if self.postings is None:
+            offsets = self.trigram_offsets
+            self.postings = {
+                trigram: (offsets[k], offsets[k + 1])
+                for k, trigram in enumerate(self.trigram_keys)
+            }
+        return self.postings
+
+
+def find(table, key):
+    """
+    Returns the position of `key` in the sorted sequence `table`,
+    or None if it is not present.
+    """
+    i = bisect.bisect_left(table, key)
+    if i < len(table) and table[i] == key:
+        return i
+    return None
+
+
+def build_graph(people, movies, stars):
+    """
+    Build a Graph from `people`, a tuple of (ids, names, births) column
+    lists, `movies`, a tuple of (ids, titles, years) column lists, and
+    `stars`, an iterable of (person_id, movie_id) pairs, all in file order.
+
+    When an id appears more than once, its last row wins. Pairs naming an
+    unknown person or movie are skipped.
+    """
+    person_order = sorted_unique(people[0])
+    movie_order = sorted_unique(movies[0])
+    person_ids = [people[0][i] for i in person_order]
+    movie_ids = [movies[0][i] for i in movie_order]
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+    # Collect the edge list as two parallel int arrays in a single pass
+    star_people = array("i")
+    star_movies = array("i")
+    for person_id, movie_id in stars:
+        person = person_index.get(person_id)
+        movie = movie_index.get(movie_id)
+        if person is None or movie is None:
+            continue
+        star_people.append(person)
+        star_movies.append(movie)
+    del person_index, movie_index
+
+    person_offsets, person_movies = compress(len(person_ids), star_people, star_movies)
+    movie_offsets, movie_stars = compress(len(movie_ids), star_movies, star_people)
+    del star_people, star_movies
+
+    person_names = [people[1][i] for i in person_order]
+    keys = sorted(range(len(person_names)), key=lambda i: (person_names[i].lower(), i))
+
+    name_keys = [person_names[i].lower() for i in keys]
+    trigram_keys, trigram_offsets, trigram_names = index_trigrams(name_keys)
+
+    return Graph(
+        person_ids=person_ids,
+        person_names=person_names,
+        person_births=[people[2][i] for i in person_order],
+        movie_ids=movie_ids,
+        movie_titles=[movies[1][i] for i in movie_order],
+        movie_years=[movies[2][i] for i in movie_order],
+        name_keys=name_keys,
+        name_people=array("i", keys),
+        trigram_keys=trigram_keys,
+        trigram_offsets=trigram_offsets,
+        trigram_names=trigram_names,
+        person_offsets=person_offsets,
+        person_movies=person_movies,
+        movie_offsets=movie_offsets,
+        movie_stars=movie_stars,
+    )
+
+
+def sorted_unique(ids):
+    """
+    Returns the positions in `ids` that order them, keeping only the last
+    position of any id that appears more than once.
+    """
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    return [
+        position for k, position in enumerate(order)
+        if k + 1 == len(order) or ids[order[k + 1]] != ids[position]
+    ]
+
+
+def index_trigrams(name_keys):
+    """
+    Build an inverted index from each trigram of the sorted `name_keys`
+    to the first position of every distinct name containing it.
+
+    Returns (trigram_keys, trigram_offsets, trigram_names).
+    """
+    postings = {}
+    previous = None
+    for position, key in enumerate(name_keys):
+        if key == previous:
+            continue
+        previous = key
+        for trigram in trigrams(key):
+            if trigram not in postings:
+                postings[trigram] = array("i")
+            postings[trigram].append(position)
+
+    trigram_keys = sorted(postings)
+    trigram_offsets = array("q", [0])
+    trigram_names = array("i")
+    for trigram in trigram_keys:
+        trigram_names.extend(postings[trigram])
+        trigram_offsets.append(len(trigram_names))
+    return trigram_keys, trigram_offsets, trigram_names
+
+
+def trigrams(name):
+    """
+    Returns the set of three-character substrings of `name`, padded so
+    that its first and last letters start and end trigrams of their own.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def compress(count, sources, targets):
+    """
+    Group the edges `sources[k] -> targets[k]` by source into compressed
+    sparse row arrays for `count` rows. Each row is sorted, and duplicate
+    edges are dropped.
+
+    Returns (offsets, indices).
+    """
+    # Counting sort of the edges by source: `cursor` starts as the first
+    # slot of each row and ends as the first slot of the next one
+    cursor = array("q", bytes(8 * (count + 1)))
+    for source, size in Counter(sources).items():
+        cursor[source + 1] = size
+    total = 0
+    for row in range(count + 1):
+        total += cursor[row]
+        cursor[row] = total
+    grouped = array("i", bytes(4 * len(targets)))
+    for source, target in zip(sources, targets):
+        slot = cursor[source]
+        grouped[slot] = target
+        cursor[source] = slot + 1
+
+    # Sort each row and drop duplicate edges
+    offsets = array("q", bytes(8 * (count + 1)))
+    indices = array("i")
+    start = 0
+    for row in range(count):
+        end = cursor[row]
+        if end - start > 1:
+            indices.extend(sorted(set(grouped[start:end])))
+        elif end > start:
+            indices.append(grouped[start])
+        offsets[row + 1] = len(indices)
+        start = end
+
+    return offsets, indices
+
+
+class People(Mapping):
+    """
+    Read-only view of a Graph as the `people` mapping: person_id to a
+    dictionary of name, birth and movies (a set of movie_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)},
+        }
+
+    def __contains__(self, person_id):
+        return self.graph.person_index(person_id) is not None
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class Movies(Mapping):
+    """
+    Read-only view of a Graph as the `movies` mapping: movie_id to a
+    dictionary of title, year and stars (a set of person_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person] for person in graph.stars_of(movie)},
+        }
+
+    def __contains__(self, movie_id):
+        return self.graph.movie_index(movie_id) is not None
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class Names(Mapping):
+    """
+    Read-only view of a Graph as the `names` mapping: lowercased name
+    to a set of the corresponding person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __contains__(self, name):
+        return bool(self.graph.people_named(name))
+
+    def __iter__(self):
+        previous = None
+        for key in self.graph.name_keys:
+            if key != previous:
+                yield key
+                previous = key
+
+    def __len__(self):
+        return sum(1 for _ in self)
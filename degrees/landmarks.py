@@ -0,0 +1,280 @@
+import heapq
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+
+import snapshot
+
+# Landmark index file written next to the CSV files it was built from
+FILENAME = ".degrees.landmarks"
+
+# Bump whenever the layout of the index changes
+VERSION = 1
+
+MAGIC = b"LANDMARK"
+
+# Number of landmarks chosen when none is given
+LANDMARKS = 16
+
+# Distances are stored one byte each; this marks people a landmark can't reach
+UNREACHABLE = 255
+
+# Magic, version, landmark count, person count, then the snapshot key
+HEADER = struct.Struct("<8sIII4x" + "qq" * len(snapshot.SOURCES))
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python landmarks.py directory [landmarks]")
+    directory = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else LANDMARKS
+
+    import degrees
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Data loaded.")
+
+    start = time.perf_counter()
+    index = build(degrees.graph, count)
+    save(index, directory, snapshot.source_key(directory))
+    print(f"Built {len(index.landmarks)} landmarks in {time.perf_counter() - start:.2f}s.")
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few landmark people to everyone else.
+
+    `landmarks` holds the landmarks' person indices, and `distances[i]`
+    the distance from landmark i to every person, one byte each, with
+    UNREACHABLE for people in other components.
+
+    By the triangle inequality, the separation between s and t is at least
+    |d(L, s) - d(L, t)| and at most d(L, s) + d(L, t) for every landmark L.
+    """
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        the people with indices `source` and `target`. Both are math.inf if
+        some landmark shows the two are not connected.
+        """
+        lower = 0
+        upper = math.inf
+        for row in self.distances:
+            s, t = row[source], row[target]
+            if s == UNREACHABLE and t == UNREACHABLE:
+                continue
+            if s == UNREACHABLE or t == UNREACHABLE:
+                return math.inf, math.inf
+            lower = max(lower, abs(s - t))
+            upper = min(upper, s + t)
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns a function giving a lower bound on the distance from any
+        person connected to `target` to `target` itself.
+        """
+        columns = [
+            (row, row[target]) for row in self.distances
+            if row[target] != UNREACHABLE
+        ]
+
+        def estimate(person):
+            best = 0
+            for row, distance in columns:
+                difference = abs(row[person] - distance)
+                if difference > best:
+                    best = difference
+            return best
+
+        return estimate
+
+
+def choose_landmarks(graph, count):
+    """
+    Returns the indices of the `count` people with the most co-star
+    appearances, counted as the total cast size of their movies.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets = graph.movie_offsets
+    cast_sizes = [
+        movie_offsets[movie + 1] - movie_offsets[movie]
+        for movie in range(len(movie_offsets) - 1)
+    ]
+    degree = [
+        sum(cast_sizes[person_movies[i]]
+            for i in range(person_offsets[person], person_offsets[person + 1]))
+        for person in range(len(person_offsets) - 1)
+    ]
+    return sorted(range(len(degree)), key=degree.__getitem__, reverse=True)[:count]
+
+
+def distances_from(graph, source):
+    """
+    Returns an array of the degrees of separation from the person with
+    index `source` to everyone, with UNREACHABLE for people not connected.
+    Distances too large for a byte are stored as UNREACHABLE - 1.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+    distances = array("B", [UNREACHABLE]) * (len(person_offsets) - 1)
+    distances[source] = 0
+
+    frontier = deque([source])
+    while frontier:
+        person = frontier.popleft()
+        distance = min(distances[person] + 1, UNREACHABLE - 1)
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                neighbor = movie_stars[j]
+                if distances[neighbor] == UNREACHABLE:
+                    distances[neighbor] = distance
+                    frontier.append(neighbor)
+    return distances
+
+
+def build(graph, count=LANDMARKS):
+    """
+    Build a LandmarkIndex over `graph` from its `count` best-connected
+    people.
+    """
+    landmarks = choose_landmarks(graph, count)
+    return LandmarkIndex(
+        array("i", landmarks),
+        [distances_from(graph, landmark) for landmark in landmarks]
+    )
+
+
+def save(index, directory, key):
+    """
+    Write `index` to `directory`, keyed on `key`, the source_key of the
+    CSV files its graph was built from.
+
+    Returns False if the index could not be written.
+    """
+    people = len(index.distances[0]) if index.distances else 0
+    path = os.path.join(directory, FILENAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(index.landmarks), people, *key))
+            f.write(array("i", index.landmarks).tobytes())
+            for row in index.distances:
+                f.write(bytes(row))
+        os.replace(partial, path)
+    except OSError:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load(directory, key):
+    """
+    Memory-map the landmark index in `directory`.
+
+    Returns None if there is no index, or if it was written by another
+    version or built from CSV files other than those matching `key`.
+    """
+    path = os.path.join(directory, FILENAME)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, count, people, *stored_key = HEADER.unpack_from(buffer)
+    if (magic, version) != (MAGIC, VERSION) or tuple(stored_key) != key:
+        return None
+    if len(buffer) != HEADER.size + 4 * count + count * people:
+        return None
+
+    view = memoryview(buffer)
+    start = HEADER.size + 4 * count
+    landmarks = view[HEADER.size:start].cast("i")
+    distances = [
+        view[start + i * people:start + (i + 1) * people]
+        for i in range(count)
+    ]
+    return LandmarkIndex(landmarks, distances)
+
+
+def astar(graph, index, source, target, limit=None, stats=None):
+    """
+    A* search from the person with index `source` to `target`, guided by
+    the landmark lower bounds, skipping people who can't be on a path of
+    at most `limit` degrees when `limit` is given.
+
+    Returns a list of (movie, person) index pairs, or None if there is
+    no such path.
+
+    If `stats` is a dict, the number of people expanded is stored
+    under "expanded".
+    """
+    expanded = 0
+    answer = None
+    lower, _ = index.bounds(source, target)
+    if source != target and lower != math.inf and (limit is None or lower <= limit):
+        estimate = index.heuristic(target)
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+
+        # Maps each reached person to their distance and the step
+        # they were reached through
+        distances = {source: 0}
+        parents = {source: None}
+        closed = set()
+
+        # Ties go to the deepest person, which reaches the target sooner
+        frontier = [(lower, 0, source)]
+        while frontier:
+            _, depth, person = heapq.heappop(frontier)
+            if person in closed:
+                continue
+            if person == target:
+                answer = []
+                while parents[person] is not None:
+                    movie, previous = parents[person]
+                    answer.append((movie, person))
+                    person = previous
+                answer.reverse()
+                break
+            closed.add(person)
+            expanded += 1
+            distance = -depth + 1
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_stars[j]
+                    if neighbor in closed or distances.get(neighbor, math.inf) <= distance:
+                        continue
+                    cost = distance + estimate(neighbor)
+                    if limit is not None and cost > limit:
+                        continue
+                    distances[neighbor] = distance
+                    parents[neighbor] = (movie, person)
+                    heapq.heappush(frontier, (cost, -distance, neighbor))
+
+    if stats is not None:
+        stats["expanded"] = expanded
+
+    return answer
+
+
+if __name__ == "__main__":
+    main()
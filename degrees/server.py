@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import degrees
+
+# Socket the server listens on when none is given
+SOCKET = "degrees.sock"
+
+# Number of recent query latencies kept for metrics
+LATENCY_WINDOW = 10000
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python server.py [directory] [socket]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    path = sys.argv[2] if len(sys.argv) > 2 else SOCKET
+    serve(directory, path)
+
+
+def serve(directory, path, processes=None):
+    """
+    Load the data in `directory` and answer queries on the Unix socket
+    `path` until interrupted.
+
+    Each line sent to the server is a JSON query, answered with one line
+    of JSON. A query of {"source": ..., "target": ...} names two people by
+    person_id or by name, and may pick a strategy from `degrees.SEARCHES`
+    with "search". The reply holds "degrees" and "path", a list of
+    [movie_id, person_id] pairs, or "error". A query of {"metrics": true}
+    is answered with latency metrics for the queries served so far.
+
+    Searches run in a pool of `processes` worker processes, each holding
+    its own copy of the graph, so slow searches don't hold up others.
+    """
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Data loaded.")
+    server = Server(directory, processes)
+    try:
+        asyncio.run(server.listen(path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class Server():
+
+    def __init__(self, directory, processes=None):
+        self.pool = ProcessPoolExecutor(
+            processes, initializer=degrees.load_data, initargs=(directory,)
+        )
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.queries = 0
+        self.errors = 0
+        self.active = 0
+
+    async def listen(self, path):
+        """Accept connections on the Unix socket `path` until terminated."""
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        print(f"Listening on {path}")
+
+        # Shut down cleanly when terminated as well as when interrupted
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    async def handle(self, reader, writer):
+        """Answer each line of JSON sent over one connection in turn."""
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("query must be a JSON object")
+                except ValueError as e:
+                    response = {"error": f"invalid query: {e}"}
+                else:
+                    response = await self.answer(request)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, request):
+        """Returns the response to a single decoded JSON query."""
+        if request.get("metrics"):
+            return self.metrics()
+
+        start = time.perf_counter()
+        self.queries += 1
+        self.active += 1
+        try:
+            search = request.get("search", "bfs")
+            if not isinstance(search, str):
+                raise LookupError("search must be a string")
+            if search not in degrees.SEARCHES:
+                raise LookupError(f"unknown search '{search}'")
+            source = resolve(request.get("source"))
+            target = resolve(request.get("target"))
+            loop = asyncio.get_running_loop()
+            path = await loop.run_in_executor(self.pool, find_path, search, source, target)
+        except LookupError as e:
+            self.errors += 1
+            response = {"error": str(e.args[0])}
+        except Exception as e:
+            # A search that fails in its worker, or a pool that has broken,
+            # is still answered and counted rather than dropping the client
+            self.errors += 1
+            response = {"error": f"search failed: {type(e).__name__}: {e}"}
+        else:
+            response = {
+                "degrees": None if path is None else len(path),
+                "path": path,
+            }
+        finally:
+            self.active -= 1
+
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        response["elapsed_ms"] = round(1000 * elapsed, 3)
+        return response
+
+    def metrics(self):
+        """
+        Returns counts of the queries served, and latency percentiles
+        over the most recent LATENCY_WINDOW of them, in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        metrics = {
+            "queries": self.queries,
+            "errors": self.errors,
+            "active": self.active,
+        }
+        if latencies:
+            metrics["latency_ms"] = {
+                "mean": round(1000 * sum(latencies) / len(latencies), 3),
+                "p50": round(1000 * percentile(latencies, 0.50), 3),
+                "p95": round(1000 * percentile(latencies, 0.95), 3),
+                "p99": round(1000 * percentile(latencies, 0.99), 3),
+                "max": round(1000 * latencies[-1], 3),
+            }
+        return metrics
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def resolve(person):
+    """
+    Returns the person_id for `person`, either a person_id or a name.
+    Raises LookupError if no single person matches.
+    """
+    if not isinstance(person, str):
+        raise LookupError("source and target must be strings")
+    if person in degrees.people:
+        return person
+    person_ids = sorted(degrees.names.get(person.lower(), set()))
+    if not person_ids:
+        suggestions = degrees.suggest_names(person)
+        if suggestions:
+            raise LookupError(f"person '{person}' not found; did you mean: {', '.join(suggestions)}")
+        raise LookupError(f"person '{person}' not found")
+    if len(person_ids) > 1:
+        raise LookupError(f"'{person}' is ambiguous: {', '.join(person_ids)}")
+    return person_ids[0]
+
+
+def find_path(search, source, target):
+    """Run `degrees.SEARCHES[search]` in a worker process."""
+    path = degrees.SEARCHES[search](source, target)
+    return None if path is None else [list(step) for step in path]
+
+
+def percentile(values, fraction):
+    """Returns the value `fraction` of the way through sorted `values`."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def query(path, request):
+    """
+    Send the query `request` to the server listening on the Unix socket
+    `path` and return its decoded response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import INT_TABLES, STRING_TABLES, Graph
+
+# Snapshot file written next to the CSV files it was built from
+FILENAME = ".degrees.snapshot"
+
+# Bump whenever the layout of the snapshot changes
+VERSION = 2
+
+MAGIC = b"DEGREES\x00"
+
+# CSV files whose mtimes and sizes key the snapshot
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Array type of each integer table
+TYPECODES = {
+    "person_offsets": "q",
+    "person_movies": "i",
+    "movie_offsets": "q",
+    "movie_stars": "i",
+    "name_people": "i",
+    "trigram_offsets": "q",
+    "trigram_names": "i",
+}
+
+# Magic, version, byte order, then an (mtime_ns, size) pair per source
+HEADER = struct.Struct("<8sIB3x" + "qq" * len(SOURCES))
+
+# Offset and length in bytes of one section of the file
+SECTION = struct.Struct("<qq")
+
+# Sections are aligned so integer arrays can be cast in place
+ALIGNMENT = 8
+
+
+class StringTable():
+    """
+    Sequence of strings stored as UTF-8 in a single buffer, decoded
+    one at a time on access.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def source_key(directory):
+    """
+    Returns the (mtime_ns, size) of every source CSV file in `directory`,
+    flattened into a tuple.
+    """
+    key = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.extend([stat.st_mtime_ns, stat.st_size])
+    return tuple(key)
+
+
+def sections():
+    """
+    Returns the names of the sections in a snapshot, in file order.
+    """
+    names = []
+    for table in STRING_TABLES:
+        names.extend([f"{table}.offsets", f"{table}.data"])
+    names.extend(INT_TABLES)
+    return names
+
+
+def save(graph, directory, key):
+    """
+    Write `graph` as a snapshot in `directory`, keyed on `key`, the
+    source_key of the CSV files it was built from.
+
+    Returns False if the snapshot could not be written.
+    """
+    buffers = {}
+    for table in STRING_TABLES:
+        offsets = array("q", [0])
+        data = bytearray()
+        for string in getattr(graph, table):
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        buffers[f"{table}.offsets"] = offsets.tobytes()
+        buffers[f"{table}.data"] = bytes(data)
+    for table in INT_TABLES:
+        buffers[table] = array(TYPECODES[table], getattr(graph, table)).tobytes()
+
+    # Lay the sections out after the header and section directory
+    names = sections()
+    position = align(HEADER.size + SECTION.size * len(names))
+    directory_entries = []
+    for name in names:
+        directory_entries.append((position, len(buffers[name])))
+        position = align(position + len(buffers[name]))
+
+    path = os.path.join(directory, FILENAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, byte_order(), *key))
+            for entry in directory_entries:
+                f.write(SECTION.pack(*entry))
+            for name, (offset, _) in zip(names, directory_entries):
+                f.write(bytes(offset - f.tell()))
+                f.write(buffers[name])
+        os.replace(partial, path)
+    except OSError:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load(directory, key):
+    """
+    Memory-map the snapshot in `directory` and return it as a Graph.
+
+    Returns None if there is no snapshot, or if it was written by another
+    version or built from CSV files other than those matching `key`.
+    """
+    path = os.path.join(directory, FILENAME)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    names = sections()
+    if len(buffer) < HEADER.size + SECTION.size * len(names):
+        return None
+    magic, version, order, *stored_key = HEADER.unpack_from(buffer)
+    if (magic, version, order) != (MAGIC, VERSION, byte_order()):
+        return None
+    if tuple(stored_key) != key:
+        return None
+
+    view = memoryview(buffer)
+    regions = {}
+    for i, name in enumerate(names):
+        offset, length = SECTION.unpack_from(buffer, HEADER.size + SECTION.size * i)
+        if offset + length > len(buffer):
+            return None
+        regions[name] = view[offset:offset + length]
+
+    tables = {}
+    for table in STRING_TABLES:
+        tables[table] = StringTable(
+            regions[f"{table}.offsets"].cast("q"),
+            regions[f"{table}.data"]
+        )
+    for table in INT_TABLES:
+        tables[table] = regions[table].cast(TYPECODES[table])
+    return Graph(**tables)
+
+
+def align(position):
+    """Round `position` up to the next multiple of ALIGNMENT."""
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def byte_order():
+    """Returns 1 on little-endian machines and 0 otherwise."""
+    return 1 if sys.byteorder == "little" else 0
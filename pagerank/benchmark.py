@@ -0,0 +1,435 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+import cache
+from crawler import crawl_graph
+from graph import LinkGraph
+from pagerank import DAMPING, crawl, iterate_pagerank, sample_pagerank, transition_model
+from sampler import load_graph, random_walk, walk_job
+from solvers import SOLVERS, jacobi, l1_distance
+
+# Sizes, in edges, of the synthetic graphs benchmarked by default; any
+# size from a thousand to ten million edges can be given instead
+SIZES = [10000, 100000, 1000000]
+
+# Share of links that go to a page chosen by how many links it already
+# has, rather than uniformly, in scale-free graphs
+ATTACHMENT = 0.8
+
+# Share of pages without any links in dangling-heavy graphs
+DANGLING = 0.5
+
+# Largest graph, in pages, written out as HTML files to time crawling
+CRAWL_PAGES = 20000
+
+# Largest graph, in pages, the original quadratic iteration is run on
+LEGACY_PAGES = 2000
+
+# Samples drawn by the sampling benchmark, and by the original sampler
+SAMPLES = 1000000
+LEGACY_SAMPLES = 10000
+
+# L1 residual the solvers are run to, and the one the reference solution
+# they are compared with is run to
+SOLVER_RESIDUAL = 1e-8
+REFERENCE_RESIDUAL = 1e-13
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(
+        arg[2:].split("=", 1) for arg in sys.argv[1:]
+        if arg.startswith("--") and "=" in arg
+    )
+    if len(args) > 1:
+        sys.exit(
+            "Usage: python benchmark.py [edges,...] "
+            f"[--graphs={','.join(GENERATORS)}] [--output=results.json]"
+        )
+    sizes = [int(size) for size in args[0].split(",")] if args else SIZES
+    graphs = options["graphs"].split(",") if "graphs" in options else list(GENERATORS)
+    for name in graphs:
+        if name not in GENERATORS:
+            sys.exit(f"Unknown graph generator: {name}")
+
+    check_spawned_workers()
+
+    print("Crawling, sampling and iteration over generated graphs")
+    results = []
+    for name in graphs:
+        for edges in sizes:
+            result = benchmark_graph(name, edges)
+            print(summary(result))
+            results.append(result)
+    if "output" in options:
+        write_results(options["output"], results)
+        print(f"Results written to {options['output']}")
+
+    print("Iteration over synthetic graphs")
+    for edges in sizes:
+        benchmark_iteration(edges)
+
+    print("Sampling over synthetic graphs")
+    for edges in sizes:
+        benchmark_sampling(edges)
+
+    print(f"Solvers over synthetic graphs (L1 residual {SOLVER_RESIDUAL})")
+    for edges in sizes:
+        benchmark_solvers(edges)
+
+
+def check_spawned_workers():
+    """
+    Check that a graph loaded from the cache, held in memory-mapped
+    memoryviews, can be sent to a worker process started with the spawn
+    method (the default on macOS and Windows), as `sampler.parallel_walks`
+    sends it, and that the worker walks it as this process does.
+    """
+    graph = generate_graph("scale-free", 10000)
+    with tempfile.TemporaryDirectory() as directory:
+        key = bytes(20)
+        cache.save(directory, key, graph)
+        cached, _ = cache.load(directory, key, DAMPING)
+        job = (0, 0, 1000, DAMPING)
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1, initializer=load_graph, initargs=(cached,)) as pool:
+            spawned = pool.apply(walk_job, (job,))
+        load_graph(cached)
+        matches = spawned == walk_job(job)
+    print(f"Cached graph sent to a spawned worker: {'ok' if matches else 'walks differ!'}")
+
+
+def synthetic_corpus(pages, edges, seed=0):
+    """
+    Return a corpus of `pages` pages with about `edges` links, in the form
+    `crawl` returns. Link targets are drawn with a bias towards low page
+    numbers so a few pages collect most links, as on the web.
+    """
+    rng = random.Random(seed)
+    names = [f"{page}.html" for page in range(pages)]
+    corpus = {name: set() for name in names}
+    for _ in range(edges):
+        source = rng.randrange(pages)
+        target = int(pages * rng.random() ** 2)
+        if source != target:
+            corpus[names[source]].add(names[target])
+    return corpus
+
+
+def scale_free(pages, edges, rng):
+    """
+    Yield `edges` (source, target) links between `pages` pages. Sources
+    are uniform; each target is, with probability ATTACHMENT, the target of
+    an earlier link chosen at random, and so chosen in proportion to how
+    many links a page already has, which gives a power-law in-degree.
+    """
+    targets = []
+    for _ in range(edges):
+        if targets and rng.random() < ATTACHMENT:
+            target = targets[int(rng.random() * len(targets))]
+        else:
+            target = int(rng.random() * pages)
+        targets.append(target)
+        yield int(rng.random() * pages), target
+
+
+def erdos_renyi(pages, edges, rng):
+    """Yield `edges` links between `pages` pages, chosen uniformly."""
+    for _ in range(edges):
+        yield int(rng.random() * pages), int(rng.random() * pages)
+
+
+def dangling_heavy(pages, edges, rng):
+    """
+    Yield `edges` links between `pages` pages like `scale_free`, but only
+    from the first 1 - DANGLING of the pages, so the rest have no links.
+    """
+    sources = max(1, int(pages * (1 - DANGLING)))
+    for source, target in scale_free(pages, edges, rng):
+        yield source % sources, target
+
+
+# Graph generators selectable by name
+GENERATORS = {
+    "scale-free": scale_free,
+    "erdos-renyi": erdos_renyi,
+    "dangling-heavy": dangling_heavy,
+}
+
+
+def generate_graph(name, edges, seed=0):
+    """
+    Returns a LinkGraph of about `edges` links, from the generator
+    `name`, over a tenth as many pages.
+    """
+    pages = max(10, edges // 10)
+    sources = array("i")
+    targets = array("i")
+    for source, target in GENERATORS[name](pages, edges, random.Random(seed)):
+        sources.append(source)
+        targets.append(target)
+    return LinkGraph.from_edges([f"{page}.html" for page in range(pages)], sources, targets)
+
+
+def write_corpus(graph, directory):
+    """Write `graph` into `directory` as one HTML file for each page."""
+    for page, name in enumerate(graph.pages):
+        links = "".join(
+            f'<li><a href="{graph.pages[link]}">{graph.pages[link]}</a></li>\n'
+            for link in graph.links_of(page)
+        )
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<body>\n<h1>{name}</h1>\n<ul>\n{links}</ul>\n</body>\n</html>\n")
+
+
+def measure(function, *args):
+    """
+    Call `function(*args)` twice: once timed, and once with tracemalloc
+    running to find the peak memory it allocates. Returns (result,
+    seconds, peak_bytes) from the timed call.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_graph(name, edges):
+    """
+    Generate a graph with `edges` links with the generator `name`, then
+    time building it, iterating over it with each of the selectable
+    solvers, sampling over it, and crawling it when it is small enough to
+    write out as HTML files.
+
+    Returns a dictionary of the results, with the peak memory of each
+    step and the L1 distance of each method's ranks from a tightly
+    converged reference solution. "iteration" is the result of the
+    default solver, and "fastest_solver" names the quickest solver.
+    """
+    start = time.perf_counter()
+    graph = generate_graph(name, edges)
+    generated = time.perf_counter() - start
+    reference = jacobi(graph, DAMPING, REFERENCE_RESIDUAL).ranks
+
+    result = {
+        "graph": name,
+        "edges": edges,
+        "pages": len(graph),
+        "links": len(graph.links),
+        "dangling": len(graph.dangling()),
+        "generate_seconds": generated,
+    }
+
+    _, seconds, peak = measure(
+        LinkGraph.from_edges, graph.pages,
+        *edge_arrays(graph)
+    )
+    result["build"] = {"seconds": seconds, "peak_bytes": peak}
+
+    result["solvers"] = {}
+    for method, solver in SOLVERS.items():
+        solution, seconds, peak = measure(solver, graph, DAMPING)
+        result["solvers"][method] = {
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "iterations": solution.iterations,
+            "residual": solution.residuals[-1],
+            "l1_error": l1_distance(solution.ranks, reference),
+        }
+    result["iteration"] = result["solvers"]["jacobi"]
+    result["fastest_solver"] = min(
+        result["solvers"], key=lambda method: result["solvers"][method]["seconds"]
+    )
+
+    visits, seconds, peak = measure(random_walk, graph, DAMPING, SAMPLES, random.Random(0))
+    result["sampling"] = {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "samples": SAMPLES,
+        "samples_per_second": SAMPLES / seconds,
+        "l1_error": l1_distance([count / SAMPLES for count in visits], reference),
+    }
+
+    result["crawl"] = None
+    if len(graph) <= CRAWL_PAGES:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(graph, directory)
+            corpus, seconds, peak = measure(crawl, directory)
+            crawled, streamed, streamed_peak = measure(crawl_graph, directory, 1)
+        result["crawl"] = {
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "pages_per_second": len(graph) / seconds,
+            "streaming_seconds": streamed,
+            "streaming_peak_bytes": streamed_peak,
+            "streaming_pages_per_second": len(graph) / streamed,
+            "links_match": (
+                sum(map(len, corpus.values())) == len(crawled.links) == len(graph.links)
+            ),
+        }
+    return result
+
+
+def edge_arrays(graph):
+    """Returns the links of `graph` as (sources, targets) arrays."""
+    sources = array("i")
+    for page in range(len(graph)):
+        sources.extend([page] * (graph.link_offsets[page + 1] - graph.link_offsets[page]))
+    return sources, array("i", graph.links)
+
+
+def summary(result):
+    """Returns a one-line summary of a `benchmark_graph` result."""
+    line = (
+        f"  {result['graph']}, {result['pages']:,} pages, {result['links']:,} links: "
+        f"build {result['build']['seconds']:.2f}s, "
+        f"iterate {result['iteration']['seconds']:.2f}s "
+        f"(peak {result['iteration']['peak_bytes'] / 2 ** 20:.1f}MB, "
+        f"error {result['iteration']['l1_error']:.1e}, "
+        f"fastest solver {result['fastest_solver']}), "
+        f"sample {result['sampling']['samples_per_second']:,.0f}/s "
+        f"(error {result['sampling']['l1_error']:.1e})"
+    )
+    if result["crawl"] is not None:
+        line += (
+            f", crawl {result['crawl']['pages_per_second']:,.0f} pages/s "
+            f"(streaming {result['crawl']['streaming_pages_per_second']:,.0f} pages/s)"
+        )
+    return line
+
+
+def write_results(path, results):
+    """Write `results`, with details of this machine, to `path` as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processors": os.cpu_count(),
+            "damping": DAMPING,
+            "results": results,
+        }, f, indent=2)
+        f.write("\n")
+
+
+def legacy_iterate_pagerank(corpus, damping_factor, threshold=0.001):
+    """
+    The original iteration, which scans every page's links to find each
+    page's incoming links: O(N^2) work per iteration.
+    """
+    n = len(corpus)
+    ranks = {page: 1 / n for page in corpus}
+    while True:
+        new_ranks = {}
+        for p in ranks:
+            total = 0
+            for page, links in corpus.items():
+                if not links:
+                    total += ranks[page] / n
+                elif p in links:
+                    total += ranks[page] / len(links)
+            new_ranks[p] = (1 - damping_factor) / n + damping_factor * total
+        if all(abs(new_ranks[p] - ranks[p]) <= threshold for p in ranks):
+            return ranks
+        ranks = new_ranks
+
+
+def legacy_sample_pagerank(corpus, damping_factor, n):
+    """
+    The original sampler, which rebuilds the transition model and draws
+    from it with random.choices at every step: O(N) work per sample.
+    """
+    answer = {p: 0 for p in corpus}
+    model = transition_model(corpus, random.choice(list(corpus)), damping_factor)
+    for _ in range(n):
+        next = random.choices(list(model), weights=list(model.values()), k=1)[0]
+        answer[next] += 1
+        model = transition_model(corpus, next, damping_factor)
+    return {page: count / n for page, count in answer.items()}
+
+
+def benchmark_iteration(edges):
+    """
+    Time iterate_pagerank on a synthetic graph with `edges` links, and the
+    original quadratic iteration too when the graph is small enough.
+    """
+    pages = max(10, edges // 10)
+    corpus = synthetic_corpus(pages, edges)
+
+    start = time.perf_counter()
+    graph = LinkGraph.from_corpus(corpus)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranks = iterate_pagerank(corpus, DAMPING)
+    elapsed = time.perf_counter() - start
+    line = (
+        f"  {pages:,} pages, {len(graph.links):,} links: "
+        f"build {built:.2f}s, iterate_pagerank (with build) {elapsed:.2f}s"
+    )
+
+    if pages <= LEGACY_PAGES:
+        start = time.perf_counter()
+        legacy = legacy_iterate_pagerank(corpus, DAMPING)
+        line += f", original {time.perf_counter() - start:.2f}s"
+        line += f" (max difference {max(abs(ranks[p] - legacy[p]) for p in ranks):.5f})"
+    print(line)
+
+
+def benchmark_sampling(edges):
+    """
+    Time sample_pagerank on a synthetic graph with `edges` links, in
+    samples per second, and the original sampler too when the graph is
+    small enough.
+    """
+    pages = max(10, edges // 10)
+    corpus = synthetic_corpus(pages, edges)
+
+    start = time.perf_counter()
+    sample_pagerank(corpus, DAMPING, SAMPLES)
+    elapsed = time.perf_counter() - start
+    line = f"  {pages:,} pages: sample_pagerank {SAMPLES / elapsed:,.0f} samples/s"
+
+    if pages <= LEGACY_PAGES:
+        start = time.perf_counter()
+        legacy_sample_pagerank(corpus, DAMPING, LEGACY_SAMPLES)
+        line += f", original {LEGACY_SAMPLES / (time.perf_counter() - start):,.0f} samples/s"
+    print(line)
+
+
+def benchmark_solvers(edges):
+    """
+    Time each of the selectable solvers on a synthetic graph with `edges`
+    links, with the iterations each takes and the L1 distance of its
+    result from a tightly converged reference solution.
+    """
+    pages = max(10, edges // 10)
+    graph = LinkGraph.from_corpus(synthetic_corpus(pages, edges))
+    reference = jacobi(graph, DAMPING, REFERENCE_RESIDUAL).ranks
+    print(f"  {pages:,} pages:")
+    for name, solver in SOLVERS.items():
+        start = time.perf_counter()
+        solution = solver(graph, DAMPING, SOLVER_RESIDUAL)
+        elapsed = time.perf_counter() - start
+        print(
+            f"    {name}: {solution.iterations} iterations, {elapsed:.2f}s, "
+            f"error {l1_distance(solution.ranks, reference):.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
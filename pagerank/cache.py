@@ -0,0 +1,177 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import LinkGraph
+
+# Cache file written into the corpus directory it was built from
+FILENAME = ".pagerank.cache"
+
+# Bump whenever the layout of the cache, or how its ranks are computed, changes
+VERSION = 2
+
+MAGIC = b"PAGERANK"
+
+# Sections of the cache, in file order, with the array type of each;
+# page names are stored as offsets into a buffer of UTF-8
+SECTIONS = (
+    ("page_offsets", "q"),
+    ("page_names", "B"),
+    ("link_offsets", "q"),
+    ("links", "i"),
+    ("backlink_offsets", "q"),
+    ("backlinks", "i"),
+    ("ranks", "d"),
+)
+
+# Magic, version, byte order, corpus key, then the damping factor the
+# ranks were computed with
+HEADER = struct.Struct("<8sIB3x20s4xd")
+
+# Offset and length in bytes of one section of the file
+SECTION = struct.Struct("<qq")
+
+# Sections are aligned so arrays can be cast in place
+ALIGNMENT = 8
+
+
+class PageNames():
+    """
+    Sequence of page names stored as UTF-8 in a single buffer, decoded
+    one at a time on access.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("page index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def corpus_key(directory):
+    """
+    Returns a digest of the name, mtime and size of every HTML page in
+    `directory`, which changes whenever a page is added, removed or edited.
+    """
+    digest = hashlib.sha1()
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".html"):
+            continue
+        stat = os.stat(os.path.join(directory, filename))
+        digest.update(f"{filename}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode("utf-8"))
+    return digest.digest()
+
+
+def save(directory, key, graph, ranks=None, damping_factor=0.0):
+    """
+    Write the LinkGraph `graph`, and the list `ranks` computed from it
+    with `damping_factor` if given, as the cache of `directory`, keyed on
+    `key`, the corpus_key of the pages it was built from.
+
+    Returns False if the cache could not be written.
+    """
+    offsets = array("q", [0])
+    names = bytearray()
+    for page in graph.pages:
+        names += page.encode("utf-8")
+        offsets.append(len(names))
+    tables = {
+        "page_offsets": offsets,
+        "page_names": names,
+        "link_offsets": graph.link_offsets,
+        "links": graph.links,
+        "backlink_offsets": graph.backlink_offsets,
+        "backlinks": graph.backlinks,
+        "ranks": ranks if ranks is not None else [],
+    }
+    buffers = [array(typecode, tables[name]).tobytes() for name, typecode in SECTIONS]
+
+    # Lay the sections out after the header and section directory
+    position = align(HEADER.size + SECTION.size * len(SECTIONS))
+    entries = []
+    for buffer in buffers:
+        entries.append((position, len(buffer)))
+        position = align(position + len(buffer))
+
+    path = os.path.join(directory, FILENAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, byte_order(), key, damping_factor))
+            for entry in entries:
+                f.write(SECTION.pack(*entry))
+            for buffer, (offset, _) in zip(buffers, entries):
+                f.write(bytes(offset - f.tell()))
+                f.write(buffer)
+        os.replace(partial, path)
+    except OSError:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load(directory, key, damping_factor):
+    """
+    Memory-map the cache of `directory` and return it as a pair
+    (graph, ranks) of a LinkGraph and its PageRank values, or None for
+    ranks if none were saved for `damping_factor`.
+
+    Returns None if there is no cache, or if it was written by another
+    version or built from pages other than those matching `key`.
+    """
+    path = os.path.join(directory, FILENAME)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(buffer) < HEADER.size + SECTION.size * len(SECTIONS):
+        return None
+    magic, version, order, stored_key, stored_damping = HEADER.unpack_from(buffer)
+    if (magic, version, order) != (MAGIC, VERSION, byte_order()) or stored_key != key:
+        return None
+
+    view = memoryview(buffer)
+    tables = {}
+    for i, (name, typecode) in enumerate(SECTIONS):
+        offset, length = SECTION.unpack_from(buffer, HEADER.size + SECTION.size * i)
+        if offset + length > len(buffer):
+            return None
+        tables[name] = view[offset:offset + length].cast(typecode)
+
+    graph = LinkGraph(
+        PageNames(tables["page_offsets"], tables["page_names"]),
+        tables["link_offsets"], tables["links"],
+        tables["backlink_offsets"], tables["backlinks"]
+    )
+    ranks = tables["ranks"]
+    if len(ranks) != len(graph) or stored_damping != damping_factor:
+        ranks = None
+    return graph, ranks
+
+
+def align(position):
+    """Round `position` up to the next multiple of ALIGNMENT."""
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def byte_order():
+    """Returns 1 on little-endian machines and 0 otherwise."""
+    return 1 if sys.byteorder == "little" else 0
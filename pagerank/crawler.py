@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+import time
+from array import array
+from multiprocessing import Pool
+
+from graph import LinkGraph
+
+# Characters read from a page at a time
+CHUNK = 1 << 16
+
+# Characters kept from the end of one chunk to scan again with the next,
+# so a link split between chunks is still found. Links in tags longer
+# than this may be missed.
+OVERLAP = 4096
+
+# Pages handed to a worker process at a time
+BATCH = 64
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python crawler.py corpus [processes]")
+    processes = int(sys.argv[2]) if len(sys.argv) == 3 else None
+
+    stats = {}
+    graph = crawl_graph(sys.argv[1], processes, stats)
+    print(f"Crawled {stats['pages']:,} pages in {stats['seconds']:.2f}s "
+          f"({stats['pages'] / max(stats['seconds'], 1e-9):,.0f} pages/s)")
+    print(f"{len(graph.links):,} links between pages in the corpus")
+
+
+def crawl_graph(directory, processes=None, stats=None):
+    """
+    Parse a directory of HTML pages, as `crawl` does, straight into a
+    LinkGraph, without holding any page's contents or every page's set of
+    links in memory at once.
+
+    Pages are read in chunks and scanned for links by a pool of
+    `processes` worker processes (all in this process if 1). Links to
+    pages outside the corpus are dropped as each page's links come back.
+
+    If `stats` is a dictionary, it is filled with the number of "pages"
+    crawled and the "seconds" taken.
+    """
+    start = time.perf_counter()
+    pages = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+    jobs = [(i, os.path.join(directory, page)) for i, page in enumerate(pages)]
+
+    sources = array("i")
+    targets = array("i")
+    for source, links in scan(jobs, processes):
+        links &= index.keys()
+        sources.extend([source] * len(links))
+        targets.extend(map(index.__getitem__, links))
+    graph = LinkGraph.from_edges(pages, sources, targets)
+
+    if stats is not None:
+        stats["pages"] = len(pages)
+        stats["seconds"] = time.perf_counter() - start
+    return graph
+
+
+def scan(jobs, processes):
+    """
+    Yield `links_in(job)` for every (page, path) job in `jobs`, in any
+    order, using a pool of `processes` workers.
+    """
+    if processes == 1 or len(jobs) <= 1:
+        yield from map(links_in, jobs)
+        return
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(links_in, jobs, BATCH)
+
+
+def links_in(job):
+    """
+    Read the page at `path` a chunk at a time and find its links.
+
+    `job` is a (page, path) pair. Returns (page, links), where links is
+    the set of pages the page links to.
+    """
+    page, path = job
+    links = set()
+    with open(path) as f:
+        tail = ""
+        chunk = f.read(CHUNK)
+        while chunk:
+            text = tail + chunk
+            chunk = f.read(CHUNK)
+            if not chunk:
+                links.update(LINK.findall(text))
+                break
+
+            # Carry over the end of the text, but not any part of it
+            # already matched, in case a link starts in this chunk and
+            # ends in the next
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            tail = text[max(end, len(text) - OVERLAP):]
+    return page, links
+
+
+if __name__ == "__main__":
+    main()
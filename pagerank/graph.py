@@ -0,0 +1,231 @@
+from array import array
+from collections import Counter, defaultdict
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus with pages interned to dense ints.
+
+    Pages are numbered in sorted order of their names. Links are stored in
+    compressed sparse row form in both directions: the pages linked to by
+    page `p` are `links[link_offsets[p]:link_offsets[p + 1]]`, and the
+    pages linking to `p` are found the same way in `backlinks`.
+    """
+
+    def __init__(self, pages, link_offsets, links, backlink_offsets, backlinks):
+        self.pages = pages
+        self.link_offsets = link_offsets
+        self.links = links
+        self.backlink_offsets = backlink_offsets
+        self.backlinks = backlinks
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __reduce__(self):
+        # Graphs loaded from the cache hold memory-mapped memoryviews, which
+        # cannot be pickled, so sending a graph to another process (as a
+        # spawned pool's initializer arguments are) copies it into arrays
+        return (type(self), (
+            list(self.pages),
+            array("q", self.link_offsets), array("i", self.links),
+            array("q", self.backlink_offsets), array("i", self.backlinks),
+        ))
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a LinkGraph from a corpus as returned by `crawl`: a dictionary
+        mapping each page to the set of pages it links to.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = array("i")
+        targets = array("i")
+        for page, links in corpus.items():
+            source = index[page]
+            for link in links:
+                sources.append(source)
+                targets.append(index[link])
+        return cls.from_edges(pages, sources, targets)
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build a LinkGraph over the list of page names `pages` from the
+        links `sources[k] -> targets[k]`, given as page indices. Self-links
+        and duplicate links are dropped, as `crawl` drops them.
+        """
+        link_offsets, links = compress(len(pages), sources, targets)
+        backlink_offsets, backlinks = compress(len(pages), targets, sources)
+        return cls(pages, link_offsets, links, backlink_offsets, backlinks)
+
+    def updated(self, pages, remap, rows):
+        """
+        Return a LinkGraph over the sorted list of page names `pages`, made
+        from this one by renumbering each of its pages i to `remap[i]`, or
+        dropping it if `remap[i]` is -1, and then replacing the links of
+        each page in the dict `rows`, which maps new page indices to the
+        set of pages they now link to. `remap` may be None if the pages are
+        the same. Pages that are new and not in `rows` have no links, and
+        links to dropped pages are dropped.
+
+        Only the rows of pages whose links or backlinks change are built
+        again; the others are copied, and renumbered, in bulk.
+        """
+        count = len(pages)
+        link_offsets, links = renumber(count, self.link_offsets, self.links, remap)
+        backlink_offsets, backlinks = renumber(
+            count, self.backlink_offsets, self.backlinks, remap
+        )
+
+        # Pages linking to dropped pages lose those links
+        rows = {page: set(row) - {page} for page, row in rows.items()}
+        if remap is not None:
+            for old_page, new_page in enumerate(remap):
+                if new_page < 0:
+                    for source in self.backlinks_of(old_page):
+                        source = remap[source]
+                        if source >= 0 and source not in rows:
+                            row = links[link_offsets[source]:link_offsets[source + 1]]
+                            rows[source] = set(row) - {-1}
+
+        # Backlinks each page gains and loses with the new rows, and the
+        # pages that dropped pages linked to, whose backlinks from them
+        # were renumbered to -1
+        gained = defaultdict(set)
+        lost = defaultdict(set)
+        for page, row in rows.items():
+            old = set(links[link_offsets[page]:link_offsets[page + 1]])
+            for target in row - old:
+                gained[target].add(page)
+            for target in old - row:
+                lost[target].add(page)
+        if remap is not None:
+            for old_page, new_page in enumerate(remap):
+                if new_page < 0:
+                    for target in self.links_of(old_page):
+                        lost[remap[target]].add(-1)
+        back_rows = {
+            target: (
+                set(backlinks[backlink_offsets[target]:backlink_offsets[target + 1]])
+                - lost[target] - {-1}
+            ) | gained[target]
+            for target in gained.keys() | lost.keys()
+            if target >= 0
+        }
+
+        link_offsets, links = splice(count, link_offsets, links, rows)
+        backlink_offsets, backlinks = splice(count, backlink_offsets, backlinks, back_rows)
+        return type(self)(pages, link_offsets, links, backlink_offsets, backlinks)
+
+    def links_of(self, page):
+        """Returns the indices of the pages page `page` links to."""
+        return self.links[self.link_offsets[page]:self.link_offsets[page + 1]]
+
+    def backlinks_of(self, page):
+        """Returns the indices of the pages that link to page `page`."""
+        return self.backlinks[self.backlink_offsets[page]:self.backlink_offsets[page + 1]]
+
+    def outdegrees(self):
+        """Returns a list of the number of links on each page."""
+        offsets = self.link_offsets
+        return [offsets[page + 1] - offsets[page] for page in range(len(self.pages))]
+
+    def dangling(self):
+        """Returns a list of the indices of pages without any links."""
+        offsets = self.link_offsets
+        return [page for page in range(len(self.pages)) if offsets[page] == offsets[page + 1]]
+
+    def to_corpus(self):
+        """Returns the graph as a corpus dictionary, as `crawl` would."""
+        return {
+            name: {self.pages[link] for link in self.links_of(page)}
+            for page, name in enumerate(self.pages)
+        }
+
+
+def compress(count, sources, targets):
+    """
+    Group the edges `sources[k] -> targets[k]` by source into compressed
+    sparse row arrays for `count` rows. Each row is sorted, and self-loops
+    and duplicate edges are dropped.
+
+    Returns (offsets, indices).
+    """
+    # Counting sort of the edges by source: `cursor` starts as the first
+    # slot of each row and ends as the first slot of the next one
+    cursor = array("q", bytes(8 * (count + 1)))
+    for source, size in Counter(sources).items():
+        cursor[source + 1] = size
+    total = 0
+    for row in range(count + 1):
+        total += cursor[row]
+        cursor[row] = total
+    grouped = array("i", bytes(4 * len(targets)))
+    for source, target in zip(sources, targets):
+        slot = cursor[source]
+        grouped[slot] = target
+        cursor[source] = slot + 1
+
+    # Sort each row and drop self-loops and duplicate edges
+    offsets = array("q", bytes(8 * (count + 1)))
+    indices = array("i")
+    start = 0
+    for row in range(count):
+        end = cursor[row]
+        if end > start:
+            row_indices = set(grouped[start:end])
+            row_indices.discard(row)
+            indices.extend(sorted(row_indices))
+        offsets[row + 1] = len(indices)
+        start = end
+
+    return offsets, indices
+
+
+def renumber(count, offsets, indices, remap):
+    """
+    Return (offsets, indices) of compressed sparse row arrays for `count`
+    rows, with each row i of `offsets` and `indices` moved to row
+    `remap[i]`, or dropped if `remap[i]` is -1, and each index mapped
+    through `remap` too. Rows keep their order, so `remap` must be
+    increasing apart from its -1s; rows nothing is moved to are empty.
+    Returns the arrays as they are if `remap` is None.
+    """
+    if remap is None:
+        return offsets, indices
+    new_offsets = array("q", bytes(8 * (count + 1)))
+    kept = array("i")
+    for row, new_row in enumerate(remap):
+        if new_row >= 0:
+            start, end = offsets[row], offsets[row + 1]
+            new_offsets[new_row + 1] = end - start
+            kept.frombytes(indices[start:end].tobytes())
+    total = 0
+    for row in range(count + 1):
+        total += new_offsets[row]
+        new_offsets[row] = total
+    return new_offsets, array("i", map(remap.__getitem__, kept))
+
+
+def splice(count, offsets, indices, rows):
+    """
+    Return (offsets, indices) of compressed sparse row arrays for `count`
+    rows, copying the rows of `offsets` and `indices` except for those in
+    the dict `rows`, which are replaced by the sets it maps them to. The
+    rows between replaced ones are copied a run at a time.
+    """
+    new_offsets = array("q", [0])
+    new_indices = array("i")
+    start = 0
+    for row in sorted(rows) + [count]:
+        if row > start:
+            shift = len(new_indices) - offsets[start]
+            new_indices.frombytes(indices[offsets[start]:offsets[row]].tobytes())
+            new_offsets.extend([offset + shift for offset in offsets[start + 1:row + 1]])
+        if row < count:
+            new_indices.extend(sorted(rows[row]))
+            new_offsets.append(len(new_indices))
+            start = row + 1
+    return new_offsets, new_indices
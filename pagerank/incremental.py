@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sys
+from array import array
+
+import cache
+from crawler import links_in
+from graph import LinkGraph
+from pagerank import DAMPING
+from solvers import MAX_ITERATIONS, RESIDUAL, jacobi
+
+# State file written into the corpus directory it describes
+FILENAME = ".pagerank.state"
+
+# Bump whenever the layout of the state file, or how its ranks are
+# converged, changes. The state keeps the signature and hash of every
+# page, the links of pages to pages outside the corpus, and the corpus key
+# of the cache holding the link graph and ranks
+VERSION = 3
+
+# Bytes hashed at a time when checking whether a page really changed
+CHUNK = 1 << 16
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python incremental.py corpus")
+    stats = {}
+    ranks = update(sys.argv[1], DAMPING, stats)
+    print(f"Re-parsed {stats['parsed']} of {stats['pages']} pages, "
+          f"converged in {stats['iterations']} iterations")
+    print(f"PageRank Results from Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def update(directory, damping_factor, stats=None, tolerance=RESIDUAL,
+           max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page in `directory`, converged until
+    the L1 residual (the sum of the changes in every page's rank) is at
+    most `tolerance`, reusing the link graph and ranks cached in the
+    directory (see `cache`) by the last update. The L1 residual sums over
+    the whole corpus, so the same tolerance means the same accuracy
+    relative to the average rank whatever the size of the corpus, and for
+    warm and cold starts alike.
+
+    Only pages whose mtime or size changed since then are read again, and
+    of those only pages whose contents hash differently are parsed again.
+    If no page was added or removed and no page's links changed, the saved
+    ranks are returned as they are. Otherwise only the rows of the cached
+    graph for pages whose links changed, or that were added or removed,
+    are replaced (see `LinkGraph.updated`), and iteration starts from the
+    saved ranks, so after small edits it converges in a few iterations.
+    The new graph and ranks are cached, and the state file keeps only the
+    signature and hash of each page, for next time.
+
+    If `stats` is a dictionary, it is filled with the number of "pages",
+    how many were "parsed" again, and the "iterations" run.
+    """
+    state = load(directory)
+    cached = cache.load(directory, bytes.fromhex(state["key"]), damping_factor)
+    graph, saved_ranks = cached if cached is not None else (None, None)
+    if graph is None or list(graph.pages) != list(state["files"]):
+        graph, saved_ranks = LinkGraph.from_edges([], [], []), None
+    old_index = {page: i for i, page in enumerate(graph.pages)}
+    previous = {page: state["files"][page] for page in old_index}
+
+    files = {}
+    parsed = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".html"):
+            continue
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        entry = previous.get(filename)
+        if entry is not None and entry["signature"] == signature:
+            files[filename] = entry
+            continue
+        digest = file_hash(path)
+        if entry is not None and entry["hash"] == digest:
+            files[filename] = dict(entry, signature=signature)
+            continue
+        _, links = links_in((filename, path))
+        files[filename] = {"signature": signature, "hash": digest}
+        parsed[filename] = links - {filename}
+
+    pages = list(files)
+    index = {page: i for i, page in enumerate(pages)}
+    remap = None
+    if pages != list(graph.pages):
+        remap = array("i", (index.get(page, -1) for page in graph.pages))
+
+    def old_links(page):
+        """Returns the names of the pages `page` linked to before."""
+        row = graph.links_of(old_index[page])
+        return {graph.pages[link] for link in row}.union(previous[page].get("missing", ()))
+
+    # Pages not parsed again whose links change meaning anyway: those
+    # linking to a removed page, and those whose links to pages outside
+    # the corpus now reach an added one
+    relinked = set(parsed)
+    added = index.keys() - old_index.keys()
+    for page, i in old_index.items():
+        if page not in index:
+            relinked.update(graph.pages[source] for source in graph.backlinks_of(i))
+    if added:
+        relinked.update(
+            page for page, entry in files.items()
+            if not added.isdisjoint(entry.get("missing", ()))
+        )
+
+    # Replace the rows of pages whose links changed; links to pages
+    # outside the corpus are kept in the state, in case the pages appear
+    rows = {}
+    for page in relinked & index.keys():
+        links = parsed[page] if page in parsed else old_links(page)
+        entry = files[page] = dict(files[page])
+        entry.pop("missing", None)
+        missing = sorted(link for link in links if link not in index)
+        if missing:
+            entry["missing"] = missing
+        row = {index[link] for link in links if link in index}
+        if page not in old_index:
+            rows[index[page]] = row
+            continue
+        old_row = {index.get(graph.pages[link], -1) for link in graph.links_of(old_index[page])}
+        if row != old_row - {-1}:
+            rows[index[page]] = row
+
+    unchanged = not rows and remap is None and saved_ranks is not None
+    iterations = 0
+    if unchanged:
+        ranks = list(saved_ranks)
+    else:
+        if rows or remap is not None:
+            graph = graph.updated(pages, remap, rows)
+        ranks = []
+        if pages:
+            solution = jacobi(
+                graph, damping_factor, tolerance, max_iterations,
+                initial=warm_start(len(pages), remap, saved_ranks)
+            )
+            iterations = solution.iterations
+            ranks = solution.ranks
+        key = cache.corpus_key(directory)
+        saved = cache.save(directory, key, graph, ranks, damping_factor)
+        state["key"] = key.hex() if saved else ""
+    if not unchanged or files != state["files"]:
+        save(directory, {"version": VERSION, "key": state["key"], "files": files})
+
+    if stats is not None:
+        stats["pages"] = len(pages)
+        stats["parsed"] = len(parsed)
+        stats["iterations"] = iterations
+    return dict(zip(pages, ranks))
+
+
+def warm_start(count, remap, ranks):
+    """
+    Returns a starting vector for `count` pages from the saved `ranks` of
+    the pages before they were renumbered by `remap` (None if they were
+    not): pages that are new get the average rank, and the vector is
+    rescaled to sum to 1. Returns None if there are no saved ranks.
+    """
+    if not ranks or not count:
+        return None
+    if remap is None:
+        vector = list(ranks)
+    else:
+        vector = [1 / count] * count
+        for old, new in enumerate(remap):
+            if new >= 0:
+                vector[new] = ranks[old]
+    total = sum(vector)
+    return [value / total for value in vector]
+
+
+def file_hash(path):
+    """Returns the SHA-1 hex digest of the contents of the file at `path`."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load(directory):
+    """
+    Returns the state saved in `directory`, or an empty state if there is
+    none or it was written by another version.
+    """
+    empty = {"version": VERSION, "key": "", "files": {}}
+    try:
+        with open(os.path.join(directory, FILENAME), encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != VERSION or not isinstance(state["files"], dict):
+            return empty
+        bytes.fromhex(state["key"])
+    except (OSError, ValueError, AttributeError, KeyError, TypeError):
+        return empty
+    return state
+
+
+def save(directory, state):
+    """
+    Write `state` into `directory`, replacing the last one atomically.
+    Returns False if it could not be written.
+    """
+    path = os.path.join(directory, FILENAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(partial, path)
+    except OSError:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import heapq
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+
+from crawler import scan
+from pagerank import DAMPING
+from solvers import MAX_ITERATIONS, RESIDUAL, Solution
+
+# Bump whenever the layout of an edge store changes
+VERSION = 1
+
+# Edges sorted in memory at a time while building an edge store
+RUN = 1 << 22
+
+# Edges read from each sorted run at a time while merging runs
+READ = 1 << 16
+
+# Pages whose backlinks are summed before the memory they were mapped
+# into is given back
+BLOCK = 1 << 16
+
+# Pages printed by main
+TOP = 10
+
+# Most pages an edge store can hold: sources are stored as int32s, and
+# sorting encodes each edge as target * pages + source in an int64
+MAX_PAGES = 2 ** 31 - 1
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python outofcore.py corpus store")
+    directory, path = sys.argv[1:]
+    try:
+        store = EdgeStore(path)
+    except (OSError, ValueError):
+        store = build_from_corpus(directory, path)
+    solution = store.power_iteration(DAMPING)
+    print(f"PageRank over {len(store):,} pages and {store.edges:,} links "
+          f"({solution.iterations} iterations)")
+    pages = store.page_names()
+    top = heapq.nlargest(TOP, range(len(store)), key=solution.ranks.__getitem__)
+    for page in top:
+        print(f"  {pages[page]}: {solution.ranks[page]:.4f}")
+
+
+class EdgeStore():
+    """
+    Link graph kept on disk, in a directory of binary files that are
+    memory-mapped rather than read into memory:
+
+        offsets     pages + 1 int64s: the backlinks of page p are
+                    sources[offsets[p]:offsets[p + 1]]
+        sources     one int32 per link, the linking page, sorted by the
+                    page linked to
+        outdegrees  one int32 per page, its number of links
+        pages.txt   page names, one per line, if the store was built from
+                    a corpus
+
+    Iterating over it only keeps a few vectors of one value per page in
+    memory; links are streamed from the files in blocks of pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "store.json"), encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} edge store")
+        self.pages = header["pages"]
+        self.edges = header["edges"]
+        self.offsets = self.map("offsets", "q", self.pages + 1)
+        self.sources = self.map("sources", "i", self.edges)
+        self.outdegrees = self.map("outdegrees", "i", self.pages)
+
+    def __len__(self):
+        return self.pages
+
+    def map(self, name, typecode, length):
+        """Memory-map the file `name` of the store as `length` values."""
+        size = array(typecode).itemsize * length
+        if not size:
+            return array(typecode)
+        with open(os.path.join(self.path, name), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) != size:
+            raise ValueError(f"{name} in {self.path} has the wrong size")
+        return memoryview(buffer).cast(typecode)
+
+    def page_names(self):
+        """
+        Returns the page names of the store, or their indices as strings
+        if it was built without names.
+        """
+        try:
+            with open(os.path.join(self.path, "pages.txt"), encoding="utf-8") as f:
+                return f.read().splitlines()
+        except OSError:
+            return [str(page) for page in range(self.pages)]
+
+    def power_iteration(self, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS):
+        """
+        Solve for PageRank like `solvers.jacobi`, streaming the backlinks
+        of BLOCK pages at a time from disk in each iteration.
+
+        Returns a Solution whose ranks are an array of doubles, which is
+        empty, after no iterations, if the store has no pages.
+        """
+        n = self.pages
+        if not n:
+            return Solution(array("d"), 0, [])
+        d = damping_factor
+        offsets, sources, outdegrees = self.offsets, self.sources, self.outdegrees
+        ranks = array("d", [1 / n]) * n
+        residuals = []
+        while len(residuals) < max_iterations:
+            # Share of its rank each page passes along each of its links
+            shares = array("d", bytes(8 * n))
+            dangling_total = 0.0
+            for page, degree in enumerate(outdegrees):
+                if degree:
+                    shares[page] = d * ranks[page] / degree
+                else:
+                    dangling_total += ranks[page]
+            share = shares.__getitem__
+            base = (1 - d) / n + d * dangling_total / n
+
+            new_ranks = array("d", bytes(8 * n))
+            residual = 0.0
+            for first in range(0, n, BLOCK):
+                last = min(first + BLOCK, n)
+                for page in range(first, last):
+                    new = base + sum(map(share, sources[offsets[page]:offsets[page + 1]]))
+                    new_ranks[page] = new
+                    residual += abs(new - ranks[page])
+                release(sources, offsets[first], offsets[last])
+            ranks = new_ranks
+            residuals.append(residual)
+            if residual <= tolerance:
+                break
+        return Solution(ranks, len(residuals), residuals)
+
+
+def build(path, pages, edges, names=None):
+    """
+    Write an EdgeStore into the directory `path` for `pages` pages from
+    `edges`, an iterable of (source, target) page indices that need not
+    fit in memory, and return it. Self-links and duplicate links are
+    dropped. `names`, if given, is a list of the pages' names.
+
+    Edges are sorted with an external merge sort: RUN edges at a time
+    are sorted in memory and written out as a run, and the runs are then
+    merged into the store.
+
+    Raises a ValueError if `pages` is more than MAX_PAGES, or an edge
+    refers to a page outside range(pages).
+    """
+    if not 0 <= pages <= MAX_PAGES:
+        raise ValueError(f"an edge store holds at most {MAX_PAGES:,} pages, not {pages:,}")
+    os.makedirs(path, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=path) as scratch:
+        runs = write_runs(scratch, pages, edges)
+
+        outdegrees = array("i", bytes(4 * pages))
+        count = 0
+        with open(os.path.join(path, "sources"), "wb") as sources_file, \
+                open(os.path.join(path, "offsets"), "wb") as offsets_file:
+            sources = array("i")
+            offsets = array("q", [0])
+            target = 0
+            previous = None
+            for key in heapq.merge(*(read_run(run) for run in runs)):
+                if key == previous:
+                    continue
+                previous = key
+                destination, source = divmod(key, pages)
+                if source == destination:
+                    continue
+                while target < destination:
+                    offsets.append(count)
+                    target += 1
+                sources.append(source)
+                outdegrees[source] += 1
+                count += 1
+                if len(sources) >= READ:
+                    sources.tofile(sources_file)
+                    del sources[:]
+                if len(offsets) >= READ:
+                    offsets.tofile(offsets_file)
+                    del offsets[:]
+            while target < pages:
+                offsets.append(count)
+                target += 1
+            sources.tofile(sources_file)
+            offsets.tofile(offsets_file)
+
+    with open(os.path.join(path, "outdegrees"), "wb") as f:
+        outdegrees.tofile(f)
+    if names is not None:
+        with open(os.path.join(path, "pages.txt"), "w", encoding="utf-8") as f:
+            f.writelines(f"{name}\n" for name in names)
+    with open(os.path.join(path, "store.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "pages": pages, "edges": count}, f)
+    return EdgeStore(path)
+
+
+def build_from_corpus(directory, path, processes=None):
+    """
+    Crawl the corpus in `directory`, as `crawler.crawl_graph` does, into
+    an EdgeStore in `path`, streaming each page's links into the store's
+    runs as they are found.
+    """
+    names = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    index = {name: i for i, name in enumerate(names)}
+    jobs = [(i, os.path.join(directory, name)) for i, name in enumerate(names)]
+    edges = (
+        (source, index[link])
+        for source, links in scan(jobs, processes)
+        for link in links if link in index
+    )
+    return build(path, len(names), edges, names)
+
+
+def write_runs(scratch, pages, edges):
+    """
+    Sort `edges` RUN at a time by target, then source, into run files in
+    the directory `scratch`, each edge encoded as target * pages + source.
+    Returns the paths of the runs.
+    """
+    runs = []
+    run = []
+    for source, target in edges:
+        if not (0 <= source < pages and 0 <= target < pages):
+            raise ValueError(f"edge ({source}, {target}) is outside {pages:,} pages")
+        run.append(target * pages + source)
+        if len(run) >= RUN:
+            runs.append(write_run(scratch, len(runs), run))
+            run = []
+    if run or not runs:
+        runs.append(write_run(scratch, len(runs), run))
+    return runs
+
+
+def write_run(scratch, number, run):
+    run.sort()
+    path = os.path.join(scratch, f"run{number}")
+    with open(path, "wb") as f:
+        array("q", run).tofile(f)
+    return path
+
+
+def read_run(path):
+    """Yield the edges of a run file, reading READ of them at a time."""
+    with open(path, "rb") as f:
+        while True:
+            block = array("q")
+            try:
+                block.fromfile(f, READ)
+            except EOFError:
+                yield from block
+                return
+            yield from block
+
+
+def release(view, start, stop):
+    """
+    Tell the operating system the memory-mapped `view[start:stop]` will
+    not be needed again soon, so it can drop those pages from memory.
+    """
+    buffer = getattr(view, "obj", None)
+    if not isinstance(buffer, mmap.mmap) or not hasattr(buffer, "madvise"):
+        return
+    first = start * view.itemsize // mmap.PAGESIZE * mmap.PAGESIZE
+    length = stop * view.itemsize - first
+    if length > 0:
+        buffer.madvise(mmap.MADV_DONTNEED, first, length)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,86 @@
 import os
-import random
 import re
 import sys
 
+import cache
+from crawler import crawl_graph
+from graph import LinkGraph
+from sampler import WALKERS, parallel_walks, random_walk
+from solvers import MAX_ITERATIONS, RESIDUAL, SOLVERS, power_iteration
+
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(
+        arg[2:].split("=", 1) for arg in sys.argv[1:]
+        if arg.startswith("--") and "=" in arg
+    )
+    usage = (
+        "Usage: python pagerank.py corpus [--walkers=N] [--seed=S] [--error=E] "
+        f"[--solver={'|'.join(SOLVERS)} | --threshold=T]"
+    )
+    if len(args) != 1:
+        sys.exit(usage)
+    solver = options.get("solver", "jacobi")
+    if solver not in SOLVERS:
+        sys.exit(f"Unknown solver: {solver}")
+    try:
+        walkers = int(options["walkers"]) if "walkers" in options else None
+        target_error = float(options["error"]) if "error" in options else None
+        threshold = float(options["threshold"]) if "threshold" in options else None
+    except ValueError:
+        sys.exit(usage)
+    if walkers is not None and not 2 <= walkers <= SAMPLES:
+        sys.exit(f"--walkers must be between 2 and {SAMPLES}, to estimate errors")
+    directory = args[0]
+
+    # Skip crawling, and iterating too, if the corpus has not changed
+    key = cache.corpus_key(directory)
+    cached = cache.load(directory, key, DAMPING)
+    if cached is not None:
+        graph, ranks = cached
+        print("Link graph loaded from cache.")
+    else:
+        graph, ranks = crawl_graph(directory), None
+
+    if walkers is not None:
+        estimate = parallel_walks(
+            graph, DAMPING, SAMPLES,
+            walkers=walkers,
+            seed=options.get("seed"),
+            target_error=target_error
+        )
+        print(f"PageRank Results from Sampling (n = {estimate.samples}, {walkers} walkers)")
+        for page, rank, error in zip(graph.pages, estimate.ranks, estimate.errors):
+            print(f"  {page}: {rank:.4f} ± {error:.4f}")
+    else:
+        visits = random_walk(graph, DAMPING, SAMPLES)
+        print(f"PageRank Results from Sampling (n = {SAMPLES})")
+        for page, count in zip(graph.pages, visits):
+            print(f"  {page}: {count / SAMPLES:.4f}")
+
+    # Only ranks from the default solver are cached
+    if threshold is not None:
+        ranks = power_iteration(graph, DAMPING, threshold)
+        if cached is None:
+            cache.save(directory, key, graph)
+        print(f"PageRank Results from Iteration (no change above {threshold:g})")
+    elif solver != "jacobi" or ranks is None:
+        solution = SOLVERS[solver](graph, DAMPING)
+        ranks = solution.ranks
+        if solver == "jacobi":
+            cache.save(directory, key, graph, ranks, DAMPING)
+        elif cached is None:
+            cache.save(directory, key, graph)
+        print(f"PageRank Results from Iteration ({solver}, {solution.iterations} iterations, "
+              f"residual {solution.residuals[-1]:.1e})")
+    else:
+        print(f"PageRank Results from Iteration")
+    for page, rank in zip(graph.pages, ranks):
+        print(f"  {page}: {rank:.4f}")
 
 
 def crawl(directory):
@@ -97,25 +159,32 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
+    graph = LinkGraph.from_corpus(corpus)
+    visits = random_walk(graph, damping_factor, n)
+    return {page: count / n for page, count in zip(graph.pages, visits)}
 
-    answer = {p: 0 for p in corpus}
-    start_page = random.choice(list(corpus))
-    model = transition_model(corpus, start_page, damping_factor)
-
-    for i in range(n):
-        next = random.choices(list(model), weights=list(model.values()), k=1)[0]
-        answer[next] += 1
-        model = transition_model(corpus, next, damping_factor)
-
-    for key in answer:
-        answer[key] /= n
-    
-
-    return answer
 
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, seed=None,
+                             target_error=None):
+    """
+    Return PageRank values for each page from up to `n` samples shared
+    between `walkers` independent random walks run in parallel, as
+    `sampler.parallel_walks` describes.
+
+    Return a tuple (ranks, errors, samples): dictionaries mapping each page
+    to its estimated PageRank value and to the half-width of a 95%
+    confidence interval around it, and the number of samples taken, which
+    is less than `n` if every error reached `target_error` early.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, errors, samples = parallel_walks(
+        graph, damping_factor, n, walkers, seed=seed, target_error=target_error
+    )
+    return dict(zip(graph.pages, ranks)), dict(zip(graph.pages, errors)), samples
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS,
+                     method="jacobi", threshold=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -123,78 +192,19 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-
-    threshold = 0.001
-
-    N = len(corpus)
-    # We begin by assigning each page to a value of 1/N
-    current_ranks = {p: 1/N for p in corpus}
-
-    while True:
-        # We have our dictionary set up for when we get the new ranks to compare
-        new_ranks = {p: 0 for p in corpus}
-
-        # Variable keeps track if the pageranks have converges
-        converged = True
-
-        # Iterate through the pages that we have currently rankes
-        for p in current_ranks:
-            # Simpe first condition formula
-            first_condition = (1 - damping_factor) / N
-
-            # List to represent the incoming links to the current page
-            incoming_links = []
-
-            second_condition = 0
-
-            # Iterate through corpus to find all the times our page is in the links
-            for page, links in corpus.items():
-                # If the page i cannot connect to page p, we assume it connects to all
-                if len(links) == 0:
-                    second_condition += current_ranks[page] / N
-
-                # If the our page p is found in i's links then we compute normally
-                elif p in links:
-                    second_condition += current_ranks[page] / len(links)
-
-                # If we had another condition where we tried to look for p in the links and we couldnt find it but it had other links we would do nothing
-
-            # Get the total pagerank by adding them together
-            pagerank = first_condition + damping_factor * second_condition
-
-            # Assign it to the new ranks
-            new_ranks[p] = pagerank
-
-
-            # This is in a for loop so we should have all the current ranks done when we exit
-
-        # Now we iterate through the current ranks to compare them to the new ranks
-        for page in current_ranks:
-            # If our new rank does not fall under the threshold then we set converged to False
-            if abs(new_ranks[page] - current_ranks[page]) > threshold:
-                converged = False
-
-        # We check if converged is false, if it is we change all the current values to the new ones
-        if converged == False:
-            for page in current_ranks:
-                current_ranks[page] = new_ranks[page]
-
-        # If converged is True, we break out of the loop and return the current converged ranks
-        else:
-            break
-
-
-    return current_ranks
-
-
-
-
-
-
-        
-
 
+    Iteration uses `method`, one of `solvers.SOLVERS`, and stops once the
+    values change by no more than `tolerance` in total, or after
+    `max_iterations` iterations. If `threshold` is given, the original
+    rule is used instead: plain power iteration until no page's value
+    changes by more than `threshold`.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    if threshold is not None:
+        ranks = power_iteration(graph, damping_factor, threshold, max_iterations)
+    else:
+        ranks = SOLVERS[method](graph, damping_factor, tolerance, max_iterations).ranks
+    return dict(zip(graph.pages, ranks))
 
 
 if __name__ == "__main__":
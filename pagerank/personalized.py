@@ -0,0 +1,192 @@
+import random
+import sys
+from array import array
+
+from crawler import crawl_graph
+from pagerank import DAMPING
+from solvers import MAX_ITERATIONS, RESIDUAL, Solution, l1_distance
+
+# Walk segments stored for each seed page by WalkSegments
+SEGMENTS = 1000
+
+# Walks taken by WalkSegments for each estimate
+WALKS = 10000
+
+# Marks a walk segment that reached a page without links and jumped back
+# to the teleport distribution
+RESTART = -1
+
+# Pages printed for each seed set by main
+TOP = 5
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python personalized.py corpus seeds [seeds ...]")
+    graph = crawl_graph(sys.argv[1])
+    seed_sets = [seeds.split(",") for seeds in sys.argv[2:]]
+    try:
+        teleports = [teleport_vector(graph, seeds) for seeds in seed_sets]
+    except ValueError as e:
+        sys.exit(str(e))
+
+    solutions = solve(graph, DAMPING, teleports)
+    segments = WalkSegments(graph, DAMPING)
+    for seeds, teleport, solution in zip(seed_sets, teleports, solutions):
+        estimate = segments.estimate(teleport)
+        print(f"Personalized PageRank for {', '.join(seeds)} ({solution.iterations} iterations)")
+        top = sorted(range(len(graph)), key=lambda page: -solution.ranks[page])[:TOP]
+        for page in top:
+            print(f"  {graph.pages[page]}: {solution.ranks[page]:.4f} "
+                  f"(sampled {estimate[page]:.4f})")
+
+
+def teleport_vector(graph, seeds):
+    """
+    Returns a teleport vector for the LinkGraph `graph` spread evenly over
+    the pages named in `seeds`, or, if `seeds` is a dictionary, in
+    proportion to the weight it maps each page name to.
+
+    Raises a ValueError for a page not in the graph.
+    """
+    index = {page: i for i, page in enumerate(graph.pages)}
+    weights = seeds if isinstance(seeds, dict) else dict.fromkeys(seeds, 1)
+    total = sum(weights.values())
+    vector = [0.0] * len(graph)
+    for page, weight in weights.items():
+        if page not in index:
+            raise ValueError(f"{page} is not in the corpus")
+        vector[index[page]] += weight / total
+    return vector
+
+
+def solve(graph, damping_factor, teleports, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS):
+    """
+    Solve for PageRank over the LinkGraph `graph` once for each teleport
+    vector in `teleports`, a list of vectors that each sum to 1:
+
+        PR(p) = (1 - d) * v(p) + d * (sum of PR(i) / NumLinks(i) over
+                pages i linking to p, plus v(p) * sum of PR(i) over pages
+                i with no links at all)
+
+    so the surfer jumps to, and leaves pages without links for, pages
+    chosen from `v` instead of from all pages.
+
+    All vectors are iterated together, as a block: in each iteration the
+    backlinks of each page are walked once, gathering the shares of every
+    vector still in the block together. Each vector leaves the block once
+    its L1 residual is at most `tolerance`.
+
+    Returns a list of Solutions, one for each teleport vector, in order.
+    """
+    n = len(graph)
+    inverse_degrees = [1 / degree if degree else 0.0 for degree in graph.outdegrees()]
+    dangling = graph.dangling()
+    offsets, backlinks = graph.backlink_offsets, graph.backlinks
+
+    # Teleport vectors are usually sparse, so keep only their seed pages
+    seeds = [
+        [(page, v) for page, v in enumerate(teleport) if v]
+        for teleport in teleports
+    ]
+
+    ranks = [list(teleport) for teleport in teleports]
+    residuals = [[] for _ in teleports]
+    active = list(range(len(teleports)))
+    while active:
+        # Shares of every active vector passed along each page's links,
+        # as one tuple per page
+        shares = list(zip(*(
+            [rank * inverse * damping_factor for rank, inverse in zip(ranks[k], inverse_degrees)]
+            for k in active
+        )))
+        share = shares.__getitem__
+        nothing = (0.0,) * len(active)
+        sums = [
+            tuple(map(sum, zip(*map(share, backlinks[offsets[page]:offsets[page + 1]]))))
+            or nothing
+            for page in range(n)
+        ]
+
+        still_active = []
+        for k, new_x in zip(active, map(list, zip(*sums))):
+            x = ranks[k]
+            restart = (1 - damping_factor) + damping_factor * sum(x[page] for page in dangling)
+            for page, v in seeds[k]:
+                new_x[page] += restart * v
+            residuals[k].append(l1_distance(new_x, x))
+            ranks[k] = new_x
+            if residuals[k][-1] > tolerance and len(residuals[k]) < max_iterations:
+                still_active.append(k)
+        active = still_active
+
+    return [Solution(x, len(history), history) for x, history in zip(ranks, residuals)]
+
+
+class WalkSegments():
+    """
+    Random walk segments from the pages of a LinkGraph, stored so that
+    Monte Carlo estimates of personalized PageRank for many teleport
+    vectors can share them.
+
+    A segment starts at a page and, at each step, stops with probability
+    1 - d and otherwise follows a link chosen at random. Only where it
+    stopped is kept, or RESTART if it left a page without links, where the
+    surfer jumps back to the teleport distribution. The segments from a
+    page are walked the first time the page is a seed, and reused for
+    every later teleport vector that includes it.
+    """
+
+    def __init__(self, graph, damping_factor, segments=SEGMENTS, rng=random):
+        self.graph = graph
+        self.damping_factor = damping_factor
+        self.segments = segments
+        self.rng = rng
+        self.degrees = graph.outdegrees()
+        self.stored = {}
+
+    def endpoints(self, page):
+        """Returns the stored segment endpoints from `page`."""
+        if page not in self.stored:
+            self.stored[page] = array("i", (self.walk(page) for _ in range(self.segments)))
+        return self.stored[page]
+
+    def walk(self, page):
+        """Walks one segment from `page` and returns where it ended."""
+        uniform = self.rng.random
+        offsets, links, degrees = self.graph.link_offsets, self.graph.links, self.degrees
+        while uniform() < self.damping_factor:
+            degree = degrees[page]
+            if not degree:
+                return RESTART
+            page = links[offsets[page] + int(uniform() * degree)]
+        return page
+
+    def estimate(self, teleport, walks=WALKS):
+        """
+        Returns a list estimating the personalized PageRank of every page
+        for the teleport vector `teleport`, from where `walks` walks that
+        start from pages chosen from it end.
+
+        Each walk is one or more stored segments: it starts with a
+        segment from a seed page, and every time a segment ends in
+        RESTART, continues with a segment from another seed page.
+        """
+        seeds = [page for page, weight in enumerate(teleport) if weight]
+        weights = [teleport[page] for page in seeds]
+        pool = [self.endpoints(page) for page in seeds]
+        choose = self.rng.choices
+        pick = self.rng.randrange
+
+        counts = [0] * len(teleport)
+        for seed in choose(range(len(seeds)), weights, k=walks):
+            end = pool[seed][pick(self.segments)]
+            while end == RESTART:
+                seed = choose(range(len(seeds)), weights)[0]
+                end = pool[seed][pick(self.segments)]
+            counts[end] += 1
+        return [count / walks for count in counts]
+
+
+if __name__ == "__main__":
+    main()
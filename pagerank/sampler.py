@@ -0,0 +1,146 @@
+import math
+import random
+from collections import namedtuple
+from multiprocessing import Pool
+
+# Independent walkers run by parallel_walks by default
+WALKERS = 8
+
+# Most rounds parallel_walks splits its samples into when it may stop early
+ROUNDS = 10
+
+# Multiple of the standard error reported as each page's error, for 95%
+# confidence intervals: Student's t for 1 to 30 degrees of freedom (one
+# fewer than the number of walkers), and the normal value beyond that
+T_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+Z_95 = 1.96
+
+# Graph walked by the workers of a parallel_walks pool
+worker_graph = None
+
+Estimate = namedtuple("Estimate", ["ranks", "errors", "samples"])
+
+
+def random_walk(graph, damping_factor, n, rng=random):
+    """
+    Take `n` steps of the random surfer over the LinkGraph `graph`,
+    starting from a page chosen at random, and return a list of how many
+    times each page was visited.
+
+    Each step costs O(1): with probability `damping_factor` the surfer
+    follows one of the current page's links chosen uniformly, and
+    otherwise (or if the page has no links) jumps to a page chosen
+    uniformly from the whole graph. Random numbers come from `rng`.
+    """
+    pages = len(graph)
+    offsets, links = graph.link_offsets, graph.links
+    degrees = graph.outdegrees()
+    visits = [0] * pages
+    uniform = rng.random
+
+    page = int(uniform() * pages)
+    for _ in range(n):
+        degree = degrees[page]
+        if degree and uniform() < damping_factor:
+            page = links[offsets[page] + int(uniform() * degree)]
+        else:
+            page = int(uniform() * pages)
+        visits[page] += 1
+    return visits
+
+
+def parallel_walks(graph, damping_factor, n, walkers=WALKERS, processes=None,
+                   seed=None, target_error=None):
+    """
+    Estimate PageRank over the LinkGraph `graph` from up to `n` steps
+    shared between `walkers` independent random walks, run across
+    `processes` worker processes (all in this process if 1).
+
+    Every walk gets its own RNG, seeded from a master RNG seeded with
+    `seed`, so a fixed seed gives the same estimate however the walks are
+    scheduled. Each walker's visit counts give it its own estimate, and the
+    spread of those estimates gives each page's error: the half-width of a
+    95% confidence interval around the merged estimate.
+
+    If `target_error` is given, the steps are taken in rounds, and walking
+    stops after the first round in which no page's error exceeds it.
+
+    Returns an Estimate of lists (ranks, errors) indexed by page, and the
+    number of samples taken.
+    """
+    if walkers < 2:
+        raise ValueError("at least two walkers are needed to estimate errors")
+    if n < walkers:
+        raise ValueError("every walker needs at least one step")
+    master = random.Random(seed)
+    rounds = min(ROUNDS, n // walkers) if target_error is not None else 1
+    sizes = split(n, rounds * walkers)
+    visits = [[0] * len(graph) for _ in range(walkers)]
+    steps = [0] * walkers
+
+    pool = None if processes == 1 else Pool(processes, initializer=load_graph, initargs=(graph,))
+    try:
+        if pool is None:
+            load_graph(graph)
+        walk = map if pool is None else pool.imap_unordered
+        for first in range(0, len(sizes), walkers):
+            jobs = [
+                (walker, master.getrandbits(64), sizes[first + walker], damping_factor)
+                for walker in range(walkers)
+            ]
+            for walker, counts in walk(walk_job, jobs):
+                merged = visits[walker]
+                for page, count in enumerate(counts):
+                    merged[page] += count
+                steps[walker] += sum(counts)
+            estimate = summarize(visits, steps)
+            if target_error is not None and max(estimate.errors) <= target_error:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return estimate
+
+
+def split(n, parts):
+    """Returns `parts` sizes, as equal as possible, that add up to `n`."""
+    size, extra = divmod(n, parts)
+    return [size + 1 if part < extra else size for part in range(parts)]
+
+
+def load_graph(graph):
+    global worker_graph
+    worker_graph = graph
+
+
+def walk_job(job):
+    """
+    Walk `worker_graph` for one (walker, seed, steps, damping_factor) job.
+    Returns (walker, visits).
+    """
+    walker, seed, steps, damping_factor = job
+    return walker, random_walk(worker_graph, damping_factor, steps, random.Random(seed))
+
+
+def summarize(visits, steps):
+    """
+    Merge the visit counts of every walker into an Estimate, with errors
+    from the spread of the walkers' own estimates.
+    """
+    walkers = len(visits)
+    samples = sum(steps)
+    t = T_95[walkers - 2] if walkers - 1 <= len(T_95) else Z_95
+    ranks = []
+    errors = []
+    for counts in zip(*visits):
+        estimates = [count / size for count, size in zip(counts, steps)]
+        mean = sum(estimates) / walkers
+        variance = sum((estimate - mean) ** 2 for estimate in estimates) / (walkers - 1)
+        ranks.append(sum(counts) / samples)
+        errors.append(t * math.sqrt(variance / walkers))
+    return Estimate(ranks, errors, samples)
@@ -0,0 +1,292 @@
+from collections import namedtuple
+
+# Largest change in any page's rank at which the original power iteration
+# stops, kept for `power_iteration`'s legacy stopping rule
+THRESHOLD = 0.001
+
+# Most iterations run before giving up on convergence
+MAX_ITERATIONS = 1000
+
+# Sum of the changes in every page's rank (the L1 residual) at which the
+# solvers stop
+RESIDUAL = 1e-6
+
+# Iterations between extrapolations in the quadratic extrapolation solver
+EXTRAPOLATION_INTERVAL = 10
+
+# Iterations between updates of every page in the adaptive solver
+SWEEP_INTERVAL = 10
+
+Solution = namedtuple("Solution", ["ranks", "iterations", "residuals"])
+
+
+def power_iteration(graph, damping_factor, threshold=THRESHOLD, max_iterations=MAX_ITERATIONS,
+                    initial=None, stats=None):
+    """
+    Return a list of PageRank values, one for each page of the LinkGraph
+    `graph`, by repeatedly applying the PageRank formula to every page:
+
+        PR(p) = (1 - d) / N + d * (sum of PR(i) / NumLinks(i) over pages
+                i linking to p, plus sum of PR(i) / N over pages i with
+                no links at all)
+
+    The first sum is a sparse product with the graph's backlinks. Pages
+    without links are treated as linking to every page, which adds the
+    same amount to every page's rank, so it is computed once per iteration.
+
+    Iteration starts from `initial`, a list of values summing to 1, if
+    given, and from the uniform distribution otherwise. It stops once no
+    page's value changes by more than `threshold`, or after
+    `max_iterations` iterations. If `stats` is a dictionary, the number of
+    "iterations" run is stored in it.
+    """
+    model = Model(graph, damping_factor)
+    ranks = model.start(initial)
+
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        new_ranks = model.step(ranks)
+        change = max(abs(new - old) for new, old in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if change <= threshold:
+            break
+
+    if stats is not None:
+        stats["iterations"] = iterations
+    return ranks
+
+
+def jacobi(graph, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS, initial=None):
+    """
+    Solve for PageRank over the LinkGraph `graph` by power iteration,
+    computing every page's new value from the previous iteration's values,
+    until the L1 residual is at most `tolerance`.
+
+    Returns a Solution of the ranks, the iterations run, and the residual
+    after each iteration.
+    """
+    model = Model(graph, damping_factor)
+    ranks = model.start(initial)
+    residuals = []
+    while len(residuals) < max_iterations:
+        new_ranks = model.step(ranks)
+        residuals.append(l1_distance(new_ranks, ranks))
+        ranks = new_ranks
+        if residuals[-1] <= tolerance:
+            break
+    return Solution(normalized(ranks), len(residuals), residuals)
+
+
+def gauss_seidel(graph, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS,
+                 initial=None):
+    """
+    Solve for PageRank like `jacobi`, but update each page's value in
+    place, so pages later in an iteration already see the new values of
+    pages earlier in it.
+    """
+    model = Model(graph, damping_factor)
+    ranks = model.start(initial)
+    inverse_degrees = model.inverse_degrees
+    offsets, backlinks = model.offsets, model.backlinks
+    n = len(ranks)
+    teleport = (1 - damping_factor) / n
+    shares = [rank * inverse for rank, inverse in zip(ranks, inverse_degrees)]
+    share = shares.__getitem__
+    dangling_total = sum(ranks[page] for page in model.dangling)
+
+    residuals = []
+    while len(residuals) < max_iterations:
+        previous = ranks[:]
+        for page in range(n):
+            new = teleport + damping_factor * (
+                dangling_total / n
+                + sum(map(share, backlinks[offsets[page]:offsets[page + 1]]))
+            )
+            inverse = inverse_degrees[page]
+            if inverse:
+                shares[page] = new * inverse
+            else:
+                dangling_total += new - ranks[page]
+            ranks[page] = new
+
+        # Updating in place does not keep the total at 1, and the error in
+        # the total would otherwise only shrink by a factor of about d in
+        # each iteration
+        ranks = normalized(ranks)
+        shares[:] = [rank * inverse for rank, inverse in zip(ranks, inverse_degrees)]
+        dangling_total = sum(ranks[page] for page in model.dangling)
+
+        residuals.append(l1_distance(ranks, previous))
+        if residuals[-1] <= tolerance:
+            break
+    return Solution(ranks, len(residuals), residuals)
+
+
+def quadratic(graph, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS,
+              initial=None):
+    """
+    Solve for PageRank like `jacobi`, but every EXTRAPOLATION_INTERVAL
+    iterations replace the ranks with the quadratic extrapolation of the
+    last four iterates (see `extrapolate`), which cancels the two
+    slowest-converging components of the error.
+    """
+    model = Model(graph, damping_factor)
+    ranks = model.start(initial)
+    history = [ranks]
+    residuals = []
+    while len(residuals) < max_iterations:
+        new_ranks = model.step(ranks)
+        residuals.append(l1_distance(new_ranks, ranks))
+        ranks = new_ranks
+        if residuals[-1] <= tolerance:
+            break
+        history = history[-3:] + [ranks]
+        if len(residuals) % EXTRAPOLATION_INTERVAL == 0 and len(history) == 4:
+            ranks = extrapolate(*history)
+            history = [ranks]
+    return Solution(normalized(ranks), len(residuals), residuals)
+
+
+def adaptive(graph, damping_factor, tolerance=RESIDUAL, max_iterations=MAX_ITERATIONS,
+             initial=None):
+    """
+    Solve for PageRank like `jacobi`, but stop updating each page once its
+    value changes by no more than `tolerance / N` in an iteration, so
+    later iterations only sum the backlinks of pages still converging.
+
+    Every SWEEP_INTERVAL iterations, and whenever no page is left to
+    update, every page is updated again, and pages that have drifted since
+    they stopped start being updated again. Iteration only stops after
+    such a sweep, once its L1 residual is at most `tolerance`.
+
+    This is not an acceleration: pages left alone fall behind their
+    neighbours, so on most of the benchmark graphs it runs several times as
+    many iterations as `jacobi` and takes longer overall. It is selectable
+    for comparison, but never the default.
+    """
+    model = Model(graph, damping_factor)
+    ranks = model.start(initial)
+    inverse_degrees = model.inverse_degrees
+    offsets, backlinks = model.offsets, model.backlinks
+    n = len(ranks)
+    threshold = tolerance / n
+    teleport = (1 - damping_factor) / n
+    shares = [rank * inverse for rank, inverse in zip(ranks, inverse_degrees)]
+    share = shares.__getitem__
+    dangling_total = sum(ranks[page] for page in model.dangling)
+
+    active = []
+    residuals = []
+    while len(residuals) < max_iterations:
+        sweep = len(residuals) % SWEEP_INTERVAL == 0 or not active
+        base = teleport + damping_factor * dangling_total / n
+        updates = [
+            (page, base + damping_factor * sum(map(share, backlinks[offsets[page]:offsets[page + 1]])))
+            for page in (range(n) if sweep else active)
+        ]
+        change = 0.0
+        active = []
+        for page, new in updates:
+            delta = new - ranks[page]
+            ranks[page] = new
+            change += abs(delta)
+            if abs(delta) > threshold:
+                active.append(page)
+            inverse = inverse_degrees[page]
+            if inverse:
+                shares[page] = new * inverse
+            else:
+                dangling_total += delta
+        residuals.append(change)
+        if sweep and change <= tolerance:
+            break
+    return Solution(normalized(ranks), len(residuals), residuals)
+
+
+# Solvers selectable by name
+SOLVERS = {
+    "jacobi": jacobi,
+    "gauss-seidel": gauss_seidel,
+    "quadratic": quadratic,
+    "adaptive": adaptive,
+}
+
+
+class Model():
+    """
+    The parts of the PageRank formula that stay the same from one
+    iteration to the next, for the LinkGraph `graph`.
+    """
+
+    def __init__(self, graph, damping_factor):
+        self.damping_factor = damping_factor
+        self.inverse_degrees = [1 / degree if degree else 0.0 for degree in graph.outdegrees()]
+        self.dangling = graph.dangling()
+        self.offsets = graph.backlink_offsets
+        self.backlinks = graph.backlinks
+
+    def start(self, initial=None):
+        """Returns a copy of `initial`, or the uniform distribution."""
+        n = len(self.inverse_degrees)
+        return list(initial) if initial is not None else [1 / n] * n
+
+    def step(self, ranks):
+        """Returns the result of applying the PageRank formula to `ranks`."""
+        n = len(ranks)
+        d = self.damping_factor
+        offsets, backlinks = self.offsets, self.backlinks
+
+        # Share of its rank each page passes along each of its links
+        shares = [rank * inverse for rank, inverse in zip(ranks, self.inverse_degrees)]
+        share = shares.__getitem__
+        base = (1 - d) / n + d * sum(ranks[page] for page in self.dangling) / n
+
+        return [
+            base + d * sum(map(share, backlinks[offsets[page]:offsets[page + 1]]))
+            for page in range(n)
+        ]
+
+
+def extrapolate(x0, x1, x2, x3):
+    """
+    Returns the quadratic extrapolation (Kamvar et al., 2003) of four
+    successive rank vectors, rescaled to sum to 1.
+
+    Treating the error of x0 as a mix of the three slowest-converging
+    eigenvectors, coefficients g1 and g2 are chosen by least squares so
+    that g1 * (x1 - x0) + g2 * (x2 - x0) + (x3 - x0) is as close to zero
+    as possible, and the limit is a weighted sum of x1, x2 and x3. Returns
+    x3 unchanged if the differences are too close to parallel.
+    """
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [c - a for a, c in zip(x0, x2)]
+    y3 = [d - a for a, d in zip(x0, x3)]
+
+    # Solve the 2x2 normal equations of the least squares problem
+    a11, a12, a22 = dot(y1, y1), dot(y1, y2), dot(y2, y2)
+    b1, b2 = -dot(y1, y3), -dot(y2, y3)
+    determinant = a11 * a22 - a12 * a12
+    if not determinant:
+        return x3
+    g1 = (b1 * a22 - a12 * b2) / determinant
+    g2 = (a11 * b2 - a12 * b1) / determinant
+
+    w1, w2 = g1 + g2 + 1, g2 + 1
+    return normalized([w1 * a + w2 * b + c for a, b, c in zip(x1, x2, x3)])
+
+
+def dot(x, y):
+    """Returns the dot product of `x` and `y`."""
+    return sum(a * b for a, b in zip(x, y))
+
+
+def l1_distance(x, y):
+    """Returns the sum of the absolute differences between `x` and `y`."""
+    return sum(abs(a - b) for a, b in zip(x, y))
+
+
+def normalized(ranks):
+    """Returns `ranks` rescaled to sum to 1."""
+    total = sum(ranks)
+    return [rank / total for rank in ranks] if total else ranks